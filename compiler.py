@@ -3,48 +3,116 @@ Compilation Module
 Handles LaTeX to PDF compilation using pdflatex.
 """
 
+import collections
+import hashlib
+import shutil
 import subprocess
 import os
 import sys
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 
+from disk_cache import CACHE_ROOT, store_copy
 
-def compile_latex_to_pdf(tex_file_path: str, output_dir: str) -> Optional[str]:
+# Run a -draftmode pass (aux files only, no PDF output) before the final pass
+# when the document needs a second run to resolve its TOC or references
+_DRAFT_FIRST_PASS = True
+
+# Commands whose output is only correct after a second pdflatex run
+_REFERENCE_COMMANDS = ('\\tableofcontents', '\\ref{', '\\pageref{', '\\cite{')
+
+# Auxiliary files and PDFs from previous compilations, keyed by source hash
+CACHE_DIR = CACHE_ROOT
+
+# Auxiliary files that carry TOC/reference state between pdflatex runs
+_CACHED_AUX_EXTENSIONS = ('.aux', '.nav', '.out', '.snm', '.toc', '.vrb')
+
+# All auxiliary files removed by cleanup_auxiliary_files
+_AUX_EXTENSIONS = frozenset(_CACHED_AUX_EXTENSIONS + ('.log',))
+
+# Top-level build directory files read by pdflatex (theme files and logos);
+# see _hash_inputs
+_THEME_INPUT_EXTENSIONS = ('.sty', '.png')
+
+# Read size when hashing input files
+_HASH_CHUNK_SIZE = 1 << 20
+
+# Number of pdflatex log lines shown when compilation fails
+_LOG_TAIL_LINES = 50
+
+
+def compile_latex_to_pdf(tex_file_path: str, output_dir: str, cache_enabled: bool = True) -> Optional[str]:
     """
     Compile LaTeX file to PDF using pdflatex.
     
     Args:
         tex_file_path: Path to the .tex file
         output_dir: Directory containing the .tex file and dependencies
+        cache_enabled: Reuse PDFs and aux files cached by earlier runs
         
     Returns:
         Path to the generated PDF file, or None if compilation failed
     """
     try:
-        # Change to the output directory for compilation so images can be found
-        original_cwd = os.getcwd()
-        os.chdir(output_dir)
-        
-        # Get just the filename for pdflatex (since we're in the output directory)
+        # Get just the filename for pdflatex (since it runs in the output directory)
         tex_filename = os.path.basename(tex_file_path)
+        base_name = os.path.splitext(tex_filename)[0]
+        pdf_path = os.path.join(output_dir, base_name + '.pdf')
+        
+        with open(tex_file_path, 'rb') as f:
+            source = f.read()
+        
+        # Aux files depend only on the source; the PDF also depends on the
+        # images and theme files next to it
+        cache_dir = os.path.join(CACHE_DIR, hashlib.sha1(source).hexdigest())
+        cached_pdf = os.path.join(cache_dir, _hash_inputs(output_dir) + '.pdf')
         
-        # Run pdflatex from output directory
+        # Reuse the PDF from an identical previous compilation
+        if cache_enabled and os.path.exists(cached_pdf):
+            shutil.copyfile(cached_pdf, pdf_path)
+            return os.path.abspath(pdf_path)
+        
+        # A PDF left over from an earlier run must not pass for this one
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+        
+        # Restore aux files so references resolve without an extra pass
+        restored = cache_enabled and _restore_aux_files(cache_dir, output_dir, base_name)
+        
+        # Resolve TOC/references with a cheap draft pass first
+        if _DRAFT_FIRST_PASS and not restored and _needs_reference_pass(source.decode('utf-8', 'replace')):
+            subprocess.run(
+                ["pdflatex", "-interaction=nonstopmode", "-draftmode", tex_filename],
+                cwd=output_dir,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=60
+            )
+        
+        # Run pdflatex from output directory so images can be found; cwd= only
+        # affects the child process, so concurrent compilations are safe.
+        # The transcript also goes to the .log file, so stdout is discarded
         result = subprocess.run(
             ["pdflatex", "-interaction=nonstopmode", tex_filename],
-            capture_output=True,
+            cwd=output_dir,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
             text=True,
             timeout=60
         )
         
         # Check if PDF was generated (LaTeX can return non-zero exit code due to warnings)
-        pdf_filename = tex_filename.replace('.tex', '.pdf')
-        if os.path.exists(pdf_filename):
-            return os.path.abspath(pdf_filename)
+        if os.path.exists(pdf_path):
+            # Only cache clean compilations; after errors nonstopmode can
+            # leave a partial PDF, and a later fix should compile again
+            if cache_enabled and result.returncode == 0:
+                _store_in_cache(cache_dir, output_dir, base_name, cached_pdf)
+            return os.path.abspath(pdf_path)
         
         # If no PDF was generated, print error
         print(f"LaTeX compilation failed:")
         print(f"Return code: {result.returncode}")
-        print(f"STDOUT: {result.stdout}")
+        print(f"LOG (last {_LOG_TAIL_LINES} lines): {_read_log_tail(os.path.join(output_dir, base_name + '.log'))}")
         print(f"STDERR: {result.stderr}")
         return None
         
@@ -57,9 +125,100 @@ def compile_latex_to_pdf(tex_file_path: str, output_dir: str) -> Optional[str]:
     except Exception as e:
         print(f"Error during LaTeX compilation: {str(e)}")
         return None
-    finally:
-        # Return to original directory
-        os.chdir(original_cwd)
+
+
+def compile_many(tex_file_paths: List[str]) -> List[Optional[str]]:
+    """
+    Compile several LaTeX files concurrently.
+    
+    Each file is compiled in its own directory. The work happens in the
+    pdflatex child processes, so a thread per compilation is enough.
+    
+    Returns:
+        List of generated PDF paths (None for failures), in input order
+    """
+    if not tex_file_paths:
+        return []
+    
+    max_workers = min(len(tex_file_paths), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(
+            lambda tex_file_path: compile_latex_to_pdf(tex_file_path, os.path.dirname(tex_file_path) or '.'),
+            tex_file_paths
+        ))
+
+
+def _needs_reference_pass(source: str) -> bool:
+    """Check if the LaTeX source uses commands that need a second run."""
+    return any(command in source for command in _REFERENCE_COMMANDS)
+
+
+def _read_log_tail(log_path: str) -> str:
+    """Return the last lines of a pdflatex log file."""
+    try:
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            return ''.join(collections.deque(f, maxlen=_LOG_TAIL_LINES))
+    except OSError:
+        return "(no log file)"
+
+
+def _hash_inputs(output_dir: str) -> str:
+    """
+    Hash the files pdflatex reads besides the source: everything under
+    images/ and the theme files and logos copied next to the .tex file.
+    
+    Unrelated files in the build directory are not read, so an output
+    directory such as the project root does not slow the cache lookup.
+    """
+    digest = hashlib.sha1()
+    
+    # Theme .sty files and logo images at the top level
+    with os.scandir(output_dir) as entries:
+        top_level = sorted(
+            entry.name for entry in entries
+            if entry.name.endswith(_THEME_INPUT_EXTENSIONS) and entry.is_file()
+        )
+    paths = [os.path.join(output_dir, name) for name in top_level]
+    
+    # Extracted images
+    images_dir = os.path.join(output_dir, "images")
+    for root, dirs, files in os.walk(images_dir):
+        dirs.sort()
+        paths.extend(os.path.join(root, name) for name in sorted(files))
+    
+    for path in paths:
+        digest.update(os.path.relpath(path, output_dir).encode('utf-8') + b'\0')
+        digest.update(_file_digest(path))
+    return digest.hexdigest()
+
+
+def _file_digest(path: str) -> bytes:
+    """Return the SHA-1 digest of a file, read in chunks."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _restore_aux_files(cache_dir: str, output_dir: str, base_name: str) -> bool:
+    """Copy cached aux files into the build directory. Returns True if any were restored."""
+    restored = False
+    for ext in _CACHED_AUX_EXTENSIONS:
+        cached_path = os.path.join(cache_dir, base_name + ext)
+        if os.path.exists(cached_path):
+            shutil.copyfile(cached_path, os.path.join(output_dir, base_name + ext))
+            restored = True
+    return restored
+
+
+def _store_in_cache(cache_dir: str, output_dir: str, base_name: str, cached_pdf: str) -> None:
+    """Save aux files and the PDF of a successful compilation to the cache."""
+    for ext in _CACHED_AUX_EXTENSIONS:
+        path = os.path.join(output_dir, base_name + ext)
+        if os.path.exists(path):
+            store_copy(path, os.path.join(cache_dir, base_name + ext))
+    store_copy(os.path.join(output_dir, base_name + '.pdf'), cached_pdf)
 
 
 def check_latex_installation() -> bool:
@@ -77,12 +236,10 @@ def check_latex_installation() -> bool:
 
 def cleanup_auxiliary_files(output_dir: str) -> None:
     """Clean up auxiliary LaTeX files."""
-    aux_extensions = ['.aux', '.log', '.nav', '.out', '.snm', '.toc', '.vrb']
-    
-    for file in os.listdir(output_dir):
-        if any(file.endswith(ext) for ext in aux_extensions):
-            file_path = os.path.join(output_dir, file)
-            try:
-                os.remove(file_path)
-            except OSError:
-                pass  # Ignore errors when removing files
+    with os.scandir(output_dir) as entries:
+        for entry in entries:
+            if os.path.splitext(entry.name)[1] in _AUX_EXTENSIONS and entry.is_file():
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass  # Ignore errors when removing files
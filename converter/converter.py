@@ -2,15 +2,17 @@
 Main converter class for PDF to LaTeX conversion using 3-stage workflow.
 """
 
-import os
+import logging
 import re
-from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Set
 
 from .exceptions import ConversionError, APIError, ValidationError
 from .services import GeminiService
 from .workflow import (
     create_basic_latex_structure,
     extract_page_structure,
+    extract_page_titles,
     analyze_all_images,
     place_images_in_latex
 )
@@ -18,16 +20,27 @@ from .utils import (
     clean_latex_response,
     validate_frame_structure,
     remove_duplicate_images,
-    validate_and_fix_image_references
+    validate_and_fix_image_references,
+    find_existing_paths
 )
 
+logger = logging.getLogger(__name__)
+
+_DOUBLE_PATH_RE = re.compile(r'\\includegraphics\[([^\]]*)\]\{images/images/([^}]+)\}')
+
+
+def _log_double_paths(latex_content: str, step: str) -> None:
+    """Log how many images/images/ paths remain after a step (debug only)."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Double paths after %s: %d", step, sum(1 for _ in _DOUBLE_PATH_RE.finditer(latex_content)))
+
 
 class PDFToLatexConverter:
     """Main converter class for PDF to LaTeX conversion."""
     
-    def __init__(self, api_key: str):
-        """Initialize the converter with API key."""
-        self.gemini_service = GeminiService(api_key)
+    def __init__(self, api_key: str, cache_enabled: bool = True):
+        """Initialize the converter with API key (cache_enabled reuses Gemini responses from earlier runs)."""
+        self.gemini_service = GeminiService(api_key, cache_enabled)
     
     def convert(self, extracted_data: Dict[str, Any]) -> str:
         """
@@ -46,43 +59,61 @@ class PDFToLatexConverter:
         Raises:
             ConversionError: If conversion fails
         """
-        print("Stage 1: Creating basic LaTeX structure...")
-        # Stage 1: Create basic LaTeX structure from markdown
-        basic_latex = create_basic_latex_structure(extracted_data)
-        page_structure = extract_page_structure(extracted_data)
+        # Check once which extracted images exist; shared by all stages
+        existing_paths = find_existing_paths(img["path"] for img in extracted_data.get("images", []))
+        self.gemini_service.prepare_images(existing_paths)
+        # Page titles from toc_items, shared by stages 1 and 2
+        page_titles = extract_page_titles(extracted_data.get("markdown", ""))
         
-        print("Stage 2: Analyzing images...")
+        # Stages 1 and 2 are independent: run the Gemini-bound stage 2 in the
+        # background while stage 1 renders the LaTeX locally
+        executor = ThreadPoolExecutor(max_workers=1)
         # Stage 2: Analyze all images and decide what to convert vs keep
-        image_plan = analyze_all_images(extracted_data, self.gemini_service)
+        image_plan_future = executor.submit(
+            analyze_all_images, extracted_data, self.gemini_service, existing_paths, page_titles
+        )
+        
+        try:
+            print("Stage 1: Creating basic LaTeX structure...")
+            # Stage 1: Create basic LaTeX structure from markdown
+            basic_latex = create_basic_latex_structure(extracted_data, page_titles)
+            page_structure = extract_page_structure(extracted_data, page_titles)
+        except BaseException:
+            # Don't wait for the image analysis when stage 1 failed
+            image_plan_future.cancel()
+            executor.shutdown(wait=False)
+            raise
+        
+        print("Stage 2: Analyzing images...")
+        try:
+            image_plan = image_plan_future.result()
+        finally:
+            executor.shutdown()
         
         print("Stage 3: Placing images in LaTeX...")
         # Stage 3: Use LLM to intelligently place images
         final_latex = place_images_in_latex(basic_latex, page_structure, image_plan, self.gemini_service, extracted_data)
         
         # Final validation and cleanup
-        final_latex = self._finalize_latex(final_latex, extracted_data)
+        final_latex = self._finalize_latex(final_latex, extracted_data, existing_paths)
         
         return final_latex
     
-    def _finalize_latex(self, latex_content: str, extracted_data: Dict[str, Any]) -> str:
+    def _finalize_latex(self, latex_content: str, extracted_data: Dict[str, Any], existing_paths: Set[str]) -> str:
         """Final validation and cleanup of LaTeX content."""
         print("Finalizing LaTeX content...")
         
         # Clean the response
         latex_content = clean_latex_response(latex_content)
         
-        # Check if double paths are fixed after clean_latex_response
-        double_paths_after_clean = len(re.findall(r'\\includegraphics\[([^\]]*)\]\{images/images/([^}]+)\}', latex_content))
-        print(f"Double paths after clean_latex_response: {double_paths_after_clean}")
+        _log_double_paths(latex_content, "clean_latex_response")
         
         # Validate and fix image references
         available_images = extracted_data.get("images", [])
-        available_image_paths = [img["path"] for img in available_images if os.path.exists(img["path"])]
+        available_image_paths = [img["path"] for img in available_images if img["path"] in existing_paths]
         latex_content = validate_and_fix_image_references(latex_content, available_image_paths)
         
-        # Check if double paths are still fixed after validate_and_fix_image_references
-        double_paths_after_validate = len(re.findall(r'\\includegraphics\[([^\]]*)\]\{images/images/([^}]+)\}', latex_content))
-        print(f"Double paths after validate_and_fix_image_references: {double_paths_after_validate}")
+        _log_double_paths(latex_content, "validate_and_fix_image_references")
         
         # Validate frame structure
         latex_content = validate_frame_structure(latex_content)
@@ -90,20 +121,18 @@ class PDFToLatexConverter:
         # Remove duplicate images
         latex_content = remove_duplicate_images(latex_content)
         
-        # Check final double paths count
-        double_paths_final = len(re.findall(r'\\includegraphics\[([^\]]*)\]\{images/images/([^}]+)\}', latex_content))
-        print(f"Double paths final: {double_paths_final}")
+        _log_double_paths(latex_content, "remove_duplicate_images")
         
         return latex_content
     
 
 
 # Backward compatibility function
-def convert_content_to_latex(extracted_data: Dict[str, Any], api_key: str) -> str:
+def convert_content_to_latex(extracted_data: Dict[str, Any], api_key: str, cache_enabled: bool = True) -> str:
     """
     Convert extracted PDF content to LaTeX using a two-stage approach.
     
     This function maintains backward compatibility with the old interface.
     """
-    converter = PDFToLatexConverter(api_key)
+    converter = PDFToLatexConverter(api_key, cache_enabled)
     return converter.convert(extracted_data)
@@ -2,22 +2,118 @@
 Service for interacting with Google Gemini API.
 """
 
-import base64
+import hashlib
+import json
+import mimetypes
 import os
-from typing import Dict, List, Any
-from langchain_core.messages import HumanMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
+import threading
+from typing import Callable, Dict, Iterable, List, Any, Optional, Tuple
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from google.api_core import retry as google_retry
+
+try:
+    import orjson
+except ImportError:  # Optional; faster (de)serialization of the response cache
+    orjson = None
+
+from disk_cache import CACHE_ROOT, store_bytes
 
 from ..exceptions import APIError
 
+DEFAULT_MODEL = "gemini-2.5-flash-lite"
+
+# Retry rate-limit and transient server errors with exponential backoff
+# (1 s doubling up to 60 s, giving up after 5 minutes per request)
+_REQUEST_OPTIONS = {
+    "retry": google_retry.Retry(
+        predicate=google_retry.if_exception_type(
+            google_exceptions.ResourceExhausted,
+            google_exceptions.ServiceUnavailable
+        ),
+        initial=1.0,
+        maximum=60.0,
+        multiplier=2.0,
+        timeout=300.0
+    )
+}
+
+# Responses from previous runs, keyed by _response_cache_key
+RESPONSE_CACHE_DIR = os.path.join(CACHE_ROOT, "gemini")
+
+
+def _load_image_part(path: str) -> Optional[Dict[str, Any]]:
+    """Return the inline image part for an image, or None if the file cannot be read."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    return {"mime_type": mimetypes.guess_type(path)[0] or "image/png", "data": data}
+
+
+def _build_image_entry(path: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+    """Return the image part for a path with the digest of its data, or None."""
+    image_part = _load_image_part(path)
+    if image_part is None:
+        return None
+    return image_part, hashlib.sha1(image_part["data"]).digest()
+
+
+def _response_cache_key(prompt: str, image_digests: List[bytes]) -> str:
+    """Hash the model, a prompt and its image digests (order-insensitive) into a response cache key."""
+    return hashlib.blake2b(
+        DEFAULT_MODEL.encode("utf-8") + b"|" + prompt.encode("utf-8") + b"|" + b"".join(sorted(image_digests))
+    ).hexdigest()
+
+
+def _dump_json(obj: Any) -> bytes:
+    """Serialize obj to UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+def _load_json(data: bytes) -> Any:
+    """Parse UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _read_cached_response(key: str) -> Optional[str]:
+    """Return a response stored on disk by a previous run, or None."""
+    try:
+        with open(os.path.join(RESPONSE_CACHE_DIR, key + ".json"), "rb") as f:
+            return _load_json(f.read())["response"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_cached_response(key: str, response_text: str) -> None:
+    """Store a response on disk for later runs."""
+    store_bytes(os.path.join(RESPONSE_CACHE_DIR, key + ".json"), _dump_json({"response": response_text}))
+
 
 class GeminiService:
-    """Service for interacting with Google Gemini API."""
+    """Service for interacting with Google Gemini API.
+    
+    Safe to share between threads: cached models are created under a lock.
+    Responses are cached per (prompt, image contents), so identical requests
+    are only sent once. With cache_enabled, responses are also kept in
+    RESPONSE_CACHE_DIR and reused by later runs. Callers can pass a validate
+    function so that only responses they can use are cached.
+    """
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache_enabled: bool = True):
         """Initialize the Gemini service with API key."""
         self.api_key = api_key
+        self.cache_enabled = cache_enabled
+        self._models = {}
+        self._models_lock = threading.Lock()
+        self._resp_cache: Dict[str, str] = {}
+        self._resp_cache_lock = threading.Lock()
+        self._image_parts: Dict[str, Tuple[Dict[str, Any], bytes]] = {}
         self._setup_api()
     
     def _setup_api(self) -> None:
@@ -27,57 +123,95 @@ class GeminiService:
         except Exception as e:
             raise APIError(f"Failed to setup Gemini API: {str(e)}")
     
-    def analyze_images(self, prompt: str, images: List[Dict[str, Any]]) -> str:
+    def _get_model(self, name: str = DEFAULT_MODEL, temperature: float = 0.1) -> genai.GenerativeModel:
+        """Return a cached model for the given name and temperature."""
+        key = (name, temperature)
+        with self._models_lock:
+            model = self._models.get(key)
+            if model is None:
+                model = genai.GenerativeModel(
+                    name,
+                    generation_config={"temperature": temperature}
+                )
+                self._models[key] = model
+        return model
+    
+    def prepare_images(self, paths: Iterable[str]) -> None:
+        """
+        Build the image parts for a conversion once, up front.
+        
+        Later requests reuse these parts (and their digests for the response
+        cache) instead of re-reading and re-hashing each image per call.
+        Replaces any parts prepared for a previous conversion.
+        """
+        image_parts = {}
+        for path in paths:
+            entry = _build_image_entry(path)
+            if entry is not None:
+                image_parts[path] = entry
+        self._image_parts = image_parts
+    
+    def _build_contents(self, prompt: str, images: List[Dict[str, Any]]) -> Tuple[List[Any], List[bytes]]:
+        """Build the request contents (prompt, then raw image bytes) and the image digests."""
+        contents = [prompt]
+        image_digests = []
+        image_parts = self._image_parts
+        
+        # Only send images that actually exist
+        for img in images:
+            entry = image_parts.get(img["path"]) or _build_image_entry(img["path"])
+            if entry is not None:
+                contents.append(entry[0])
+                image_digests.append(entry[1])
+        
+        return contents, image_digests
+    
+    def _generate(self, prompt: str, images: List[Dict[str, Any]], validate: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Send the prompt and images to the model, reusing cached responses.
+        
+        A response is only cached if validate (when given) accepts it, so a
+        reply the caller cannot use is requested again instead of replayed.
+        """
+        contents, image_digests = self._build_contents(prompt, images)
+        key = _response_cache_key(prompt, image_digests)
+        
+        with self._resp_cache_lock:
+            cached = self._resp_cache.get(key)
+        if cached is None and self.cache_enabled:
+            cached = _read_cached_response(key)
+            # Responses cached before validation existed may be unusable
+            if cached is not None and validate is not None and not validate(cached):
+                cached = None
+            if cached is not None:
+                with self._resp_cache_lock:
+                    self._resp_cache[key] = cached
+        if cached is not None:
+            return cached
+        
+        model = self._get_model()
+        response_text = model.generate_content(contents, request_options=_REQUEST_OPTIONS).text
+        if validate is not None and not validate(response_text):
+            return response_text
+        
+        with self._resp_cache_lock:
+            self._resp_cache[key] = response_text
+        if self.cache_enabled:
+            _write_cached_response(key, response_text)
+        return response_text
+    
+    def analyze_images(self, prompt: str, images: List[Dict[str, Any]], validate: Optional[Callable[[str], bool]] = None) -> str:
         """Analyze images using Gemini API."""
         try:
-            model = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash-lite", 
-                google_api_key=self.api_key, 
-                temperature=0.1
-            )
-            
-            content_parts = [{"type": "text", "text": prompt}]
-            
-            for img in images:
-                if os.path.exists(img["path"]):
-                    with open(img["path"], "rb") as f:
-                        image_bytes = f.read()
-                    content_parts.append({
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/png;base64,{base64.b64encode(image_bytes).decode()}"}
-                    })
-            
-            message = HumanMessage(content=content_parts)
-            response = model.invoke([message])
-            return response.content
-            
+            return self._generate(prompt, images, validate)
+        
         except Exception as e:
             raise APIError(f"Failed to analyze images: {str(e)}")
     
-    def generate_latex(self, prompt: str, images: List[Dict[str, Any]]) -> str:
+    def generate_latex(self, prompt: str, images: List[Dict[str, Any]], validate: Optional[Callable[[str], bool]] = None) -> str:
         """Generate LaTeX content using Gemini API."""
         try:
-            model = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash-lite", 
-                google_api_key=self.api_key, 
-                temperature=0.1
-            )
-            
-            content_parts = [{"type": "text", "text": prompt}]
-            
-            # Only send images that actually exist
-            for img in images:
-                if os.path.exists(img["path"]):
-                    with open(img["path"], "rb") as f:
-                        img_bytes = f.read()
-                    content_parts.append({
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/png;base64,{base64.b64encode(img_bytes).decode()}"}
-                    })
-            
-            message = HumanMessage(content=content_parts)
-            response = model.invoke([message])
-            return response.content
-            
+            return self._generate(prompt, images, validate)
+        
         except Exception as e:
             raise APIError(f"Failed to generate LaTeX: {str(e)}")
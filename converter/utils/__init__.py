@@ -12,6 +12,7 @@ from .text_processing import (
     convert_text_to_latex,
     convert_markdown_to_latex
 )
+from .file_processing import find_existing_paths
 
 __all__ = [
     'clean_latex_response',
@@ -19,5 +20,6 @@ __all__ = [
     'remove_duplicate_images',
     'validate_and_fix_image_references',
     'convert_text_to_latex',
-    'convert_markdown_to_latex'
+    'convert_markdown_to_latex',
+    'find_existing_paths'
 ]
@@ -0,0 +1,31 @@
+"""
+Utilities for working with extracted files on disk.
+"""
+
+import os
+from typing import Iterable, Set
+
+
+def find_existing_paths(paths: Iterable[str]) -> Set[str]:
+    """
+    Return the subset of paths that exist as regular files.
+
+    Each parent directory is scanned once with os.scandir instead of
+    stat-ing every path, so the result can be consulted in O(1) by all
+    stages of a conversion.
+    """
+    wanted_by_dir = {}
+    for path in paths:
+        wanted_by_dir.setdefault(os.path.dirname(path), set()).add(os.path.basename(path))
+
+    existing = set()
+    for directory, wanted in wanted_by_dir.items():
+        try:
+            with os.scandir(directory or '.') as entries:
+                for entry in entries:
+                    if entry.name in wanted and entry.is_file():
+                        existing.add(os.path.join(directory, entry.name))
+        except OSError:
+            pass  # Missing or unreadable directory: none of its files exist
+
+    return existing
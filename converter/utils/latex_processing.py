@@ -2,9 +2,30 @@
 Utilities for LaTeX processing and validation.
 """
 
+import logging
 import re
 import os
-from typing import List
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Unicode characters that cause LaTeX errors, replaced in a single pass
+_UNICODE_TRANS = str.maketrans({
+    '−': '-',  # Unicode minus (U+2212)
+    '–': '--',  # En dash
+    '—': '---',  # Em dash
+})
+
+_CODE_FENCE_RE = re.compile(r'```(?:latex)?')
+_END_DOCUMENT_RE = re.compile(r'\\end\{document\}.*$', re.MULTILINE)
+# \centering before an image, optionally with the image ending its frame
+_CENTERING_IMAGE_RE = re.compile(r'\\centering\s*\n\s*\\includegraphics(?:([^}]+)\}\s*\n\s*\\end\{frame\})?')
+_ALIGN_ENV_RE = re.compile(r'\\begin\{align\*\}(.*?)\\end\{align\*\}', re.DOTALL)
+_AMPERSAND_RE = re.compile(r'([^$])\&([^$])')
+_IMAGE_REF_RE = re.compile(r'\\includegraphics\[([^\]]*)\]\{([^}]+)\}')
+_IMAGE_REF_LINE_RE = re.compile(r'\\includegraphics\[([^\]\n]*)\]\{([^}\n]+)\}')  # Within one line
+_DOUBLE_IMAGE_PATH_RE = re.compile(r'\\includegraphics\[([^\]]*)\]\{images/images/([^}]+)\}')
+_EXTRACTED_IMAGE_NAME_RE = re.compile(r'page_\d+_img_\d+\.(?:png|jpg)')
 
 
 def clean_latex_response(latex_content: str) -> str:
@@ -12,32 +33,29 @@ def clean_latex_response(latex_content: str) -> str:
     if not latex_content:
         return ""
     
-    print("clean_latex_response called")
+    logger.debug("clean_latex_response called")
     
     # Remove markdown code fences
     if latex_content.startswith('```latex'):
-        latex_content = latex_content.replace('```latex', '').replace('```', '').strip()
+        latex_content = _CODE_FENCE_RE.sub('', latex_content).strip()
     
     # Remove document structure if present
-    if '\\begin{document}' in latex_content:
-        start_idx = latex_content.find('\\begin{document}') + len('\\begin{document}')
-        end_idx = latex_content.find('\\end{document}')
-        if end_idx > start_idx:
+    begin_idx = latex_content.find('\\begin{document}')
+    if begin_idx != -1:
+        start_idx = begin_idx + len('\\begin{document}')
+        end_idx = latex_content.find('\\end{document}', start_idx)
+        if end_idx != -1:
             latex_content = latex_content[start_idx:end_idx].strip()
-    
-    # Remove any remaining document markers
-    if latex_content.strip().startswith('\\begin{document}'):
-        latex_content = latex_content.replace('\\begin{document}', '', 1).strip()
+        elif not latex_content[:begin_idx].strip():
+            # Remove a leading document marker without a matching end
+            latex_content = latex_content[start_idx:].strip()
     
     # Remove any trailing \end{document} markers
-    latex_content = re.sub(r'\\end\{document\}.*$', '', latex_content, flags=re.MULTILINE)
+    latex_content = _END_DOCUMENT_RE.sub('', latex_content)
     
     # Fix misplaced \centering commands - they should be inside frames
-    latex_content = re.sub(r'\\centering\s*\n\s*\\includegraphics', r'\\centering\n\\includegraphics', latex_content)
-    
-    # Ensure \centering is properly placed within frames
-    latex_content = re.sub(r'\\centering\s*\n\s*\\includegraphics([^}]+)\}\s*\n\s*\\end\{frame\}', 
-                           r'\\centering\n\\includegraphics\1}\n\\end{frame}', latex_content)
+    # (the same pass tidies an image that directly closes its frame)
+    latex_content = _CENTERING_IMAGE_RE.sub(_normalize_centering, latex_content)
     
     # Fix malformed math environments
     latex_content = _fix_math_environments(latex_content)
@@ -60,109 +78,96 @@ def clean_latex_response(latex_content: str) -> str:
 def validate_frame_structure(latex_content: str) -> str:
     """Ensure proper frame structure and fix common issues."""
     # Count begin and end frames
-    begin_frames = len(re.findall(r'\\begin\{frame\}', latex_content))
-    end_frames = len(re.findall(r'\\end\{frame\}', latex_content))
+    begin_frames = latex_content.count('\\begin{frame}')
+    end_frames = latex_content.count('\\end{frame}')
     
     if begin_frames != end_frames:
-        print(f"Warning: Frame mismatch - {begin_frames} begin frames, {end_frames} end frames")
+        logger.warning("Frame mismatch - %d begin frames, %d end frames", begin_frames, end_frames)
     
     # Fix common frame issues
-    # Remove any \centering that's not inside a frame
-    lines = latex_content.split('\n')
-    fixed_lines = []
-    in_frame = False
-    
-    for line in lines:
-        if '\\begin{frame}' in line:
-            in_frame = True
-        elif '\\end{frame}' in line:
-            in_frame = False
+    # Remove any \centering that's not inside a frame; only the lines that
+    # contain \centering are visited
+    removed_lines = []
+    pos = latex_content.find('\\centering')
+    
+    while pos != -1:
+        line_start, line_end = _line_bounds(latex_content, pos)
         
         # Only allow \centering inside frames
-        if '\\centering' in line and not in_frame:
-            print(f"Warning: Removed \\centering outside frame: {line.strip()}")
-            continue
-            
-        fixed_lines.append(line)
+        if not _line_in_frame(latex_content, line_start, line_end):
+            logger.warning("Removed \\centering outside frame: %s", latex_content[line_start:line_end].strip())
+            removed_lines.append((line_start, line_end))
+        
+        pos = latex_content.find('\\centering', line_end)
     
-    return '\n'.join(fixed_lines)
+    return _remove_lines(latex_content, removed_lines)
 
 
 def remove_duplicate_images(latex_content: str) -> str:
     """Remove duplicate image references, keeping only the first occurrence of each image."""
     seen_images = set()
-    lines = latex_content.split('\n')
-    filtered_lines = []
+    removed_lines = []
     duplicates_removed = 0
+    last_line_end = -1
     
-    for line in lines:
-        # Check if this line contains an includegraphics command
-        if '\\includegraphics' in line:
-            # Extract the image filename
-            match = re.search(r'\\includegraphics\[[^\]]*\]\{([^}]+)\}', line)
-            if match:
-                image_path = match.group(1)
-                image_filename = os.path.basename(image_path)
-                
-                if image_filename in seen_images:
-                    duplicates_removed += 1
-                    if duplicates_removed <= 10:  # Limit warning messages
-                        print(f"Warning: Removed duplicate image reference: {image_filename}")
-                    continue  # Skip this duplicate line
-                else:
-                    seen_images.add(image_filename)
+    for match in _IMAGE_REF_LINE_RE.finditer(latex_content):
+        # Only the first image reference on a line decides whether it is kept
+        if match.start() <= last_line_end:
+            continue
+        line_start, last_line_end = _line_bounds(latex_content, match.start())
         
-        filtered_lines.append(line)
+        image_filename = os.path.basename(match.group(2))
+        if image_filename in seen_images:
+            duplicates_removed += 1
+            if duplicates_removed <= 10:  # Limit warning messages
+                logger.warning("Removed duplicate image reference: %s", image_filename)
+            removed_lines.append((line_start, last_line_end))  # Skip this duplicate line
+        else:
+            seen_images.add(image_filename)
     
     if duplicates_removed > 10:
-        print(f"Warning: Removed {duplicates_removed} duplicate image references total")
+        logger.warning("Removed %d duplicate image references total", duplicates_removed)
     
-    return '\n'.join(filtered_lines)
+    return _remove_lines(latex_content, removed_lines)
 
 
 def validate_and_fix_image_references(latex_content: str, available_images: List[str]) -> str:
     """Remove references to non-existent images and fix image paths."""
-    # Get list of available image filenames
-    available_filenames = [os.path.basename(img) for img in available_images]
+    # Get set of available image filenames (O(1) lookups per reference)
+    available_filenames = frozenset(os.path.basename(img) for img in available_images)
     
-    # Find all image references
-    image_refs = re.findall(r'\\includegraphics\[([^\]]*)\]\{([^}]+)\}', latex_content)
-    
-    for size, path in image_refs:
+    def remove_missing_image(match):
         # Extract just the filename from the path
-        filename = os.path.basename(path)
+        filename = os.path.basename(match.group(2))
+        if filename in available_filenames:
+            return match.group(0)
         
-        # If the image doesn't exist, remove the entire includegraphics line
-        if filename not in available_filenames:
-            # Remove the entire line containing this image reference
-            pattern = r'\\includegraphics\[[^\]]*\]\{[^}]*' + re.escape(filename) + r'[^}]*\}'
-            latex_content = re.sub(pattern, '', latex_content)
-            print(f"Warning: Removed reference to non-existent image: {filename}")
+        # The image doesn't exist, so remove the includegraphics command
+        logger.warning("Removed reference to non-existent image: %s", filename)
+        return ''
     
-    return latex_content
+    # Check all image references in a single pass
+    return _IMAGE_REF_RE.sub(remove_missing_image, latex_content)
 
 
 def _fix_unicode_characters(latex_content: str) -> str:
     """Fix Unicode characters that cause LaTeX errors."""
-    latex_content = latex_content.replace('−', '-')  # Unicode minus (U+2212)
-    latex_content = latex_content.replace('–', '--')  # En dash
-    latex_content = latex_content.replace('—', '---')  # Em dash
-    return latex_content
+    return latex_content.translate(_UNICODE_TRANS)
 
 
 def _fix_latex_syntax(latex_content: str) -> str:
     """Fix common LaTeX syntax issues."""
     # Fix misplaced & characters outside math mode
-    latex_content = re.sub(r'([^$])\&([^$])', r'\1\\&\2', latex_content)
+    latex_content = _AMPERSAND_RE.sub(r'\1\\&\2', latex_content)
     
     # Fix mismatched list environments
     # Replace \begin{enumerate} that should be \begin{itemize}
-    latex_content = re.sub(r'\\begin\{enumerate\}', r'\\begin{itemize}', latex_content)
-    latex_content = re.sub(r'\\end\{enumerate\}', r'\\end{itemize}', latex_content)
+    latex_content = latex_content.replace('\\begin{enumerate}', '\\begin{itemize}')
+    latex_content = latex_content.replace('\\end{enumerate}', '\\end{itemize}')
     
     # Ensure every \begin{frame} has a matching \end{frame}
-    begin_frames = len(re.findall(r'\\begin\{frame\}', latex_content))
-    end_frames = len(re.findall(r'\\end\{frame\}', latex_content))
+    begin_frames = latex_content.count('\\begin{frame}')
+    end_frames = latex_content.count('\\end{frame}')
     
     if begin_frames != end_frames:
         raise ValueError(f"Frame mismatch: {begin_frames} begin frames, {end_frames} end frames")
@@ -174,38 +179,44 @@ def _fix_math_environments(latex_content: str) -> str:
     """Fix malformed math environments."""
     # Fix malformed align* environments that contain text
     # Pattern: \begin{align*} ... \text{...} ... \end{align*}
-    def fix_align_environment(match):
-        content = match.group(1)
-        # If the content contains \text{...}, it's likely malformed
-        if '\\text{' in content:
-            # Extract the math part and text parts separately
-            parts = content.split('\\\\')
-            math_parts = []
-            text_parts = []
-            
-            for part in parts:
-                if '\\text{' in part:
-                    text_parts.append(part.strip())
-                else:
-                    math_parts.append(part.strip())
-            
-            # If we have both math and text, separate them
-            if math_parts and text_parts:
-                result = []
-                if math_parts:
-                    result.append('\\begin{align*}\n' + ' \\\\\n'.join(math_parts) + '\n\\end{align*}\n')
-                if text_parts:
-                    result.append('\n'.join(text_parts))
-                return '\n'.join(result)
-        
-        return match.group(0)
+    # Without any \text{ there is nothing to fix, so skip the regex scan
+    if '\\text{' not in latex_content:
+        return latex_content
     
     # Apply the fix
-    latex_content = re.sub(r'\\begin\{align\*\}(.*?)\\end\{align\*\}', fix_align_environment, latex_content, flags=re.DOTALL)
+    latex_content = _ALIGN_ENV_RE.sub(_fix_align_environment, latex_content)
     
     return latex_content
 
 
+def _fix_align_environment(match: re.Match) -> str:
+    """Split an align* environment that mixes math and \\text{...} lines."""
+    content = match.group(1)
+    # If the content contains \text{...}, it's likely malformed
+    if '\\text{' in content:
+        # Extract the math part and text parts separately
+        parts = content.split('\\\\')
+        math_parts = []
+        text_parts = []
+        
+        for part in parts:
+            if '\\text{' in part:
+                text_parts.append(part.strip())
+            else:
+                math_parts.append(part.strip())
+        
+        # If we have both math and text, separate them
+        if math_parts and text_parts:
+            result = []
+            if math_parts:
+                result.append('\\begin{align*}\n' + ' \\\\\n'.join(math_parts) + '\n\\end{align*}\n')
+            if text_parts:
+                result.append('\n'.join(text_parts))
+            return '\n'.join(result)
+    
+    return match.group(0)
+
+
 def _fix_brace_matching(latex_content: str) -> str:
     """Ensure proper brace matching."""
     # Count braces
@@ -221,54 +232,93 @@ def _fix_brace_matching(latex_content: str) -> str:
 
 def _fix_image_paths(latex_content: str) -> str:
     """Fix image paths to reference the images/ subdirectory."""
-    # Fix double images/ paths - this is the main issue
-    original_content = latex_content
-    
-    # Count double images paths before fixing
-    double_paths_before = len(re.findall(r'\\includegraphics\[([^\]]*)\]\{images/images/([^}]+)\}', latex_content))
-    
-    if double_paths_before > 0:
-        print(f"Found {double_paths_before} double image paths to fix")
-        # Show first few examples
-        examples = re.findall(r'\\includegraphics\[([^\]]*)\]\{images/images/([^}]+)\}', latex_content)[:3]
-        for size, filename in examples:
-            print(f"  Example: \\includegraphics[{size}]{{images/images/{filename}}}")
-    
-    # Test the replacement on a sample
-    if double_paths_before > 0:
-        sample = re.findall(r'\\includegraphics\[([^\]]*)\]\{images/images/([^}]+)\}', latex_content)[0]
-        print(f"  Sample before: \\includegraphics[{sample[0]}]{{images/images/{sample[1]}}}")
-    
-    latex_content = re.sub(r'\\includegraphics\[([^\]]*)\]\{images/images/([^}]+)\}', 
-                           r'\\includegraphics[\1]{images/\2}', 
-                           latex_content)
-    
-    # Test the replacement on the same sample
-    if double_paths_before > 0:
-        sample_after = re.findall(r'\\includegraphics\[([^\]]*)\]\{images/images/([^}]+)\}', latex_content)
-        print(f"  Sample after: {len(sample_after)} double paths remaining")
-    
-    # Also fix any other double path patterns
-    latex_content = re.sub(r'\\includegraphics\[([^\]]*)\]\{([^}]*)/images/([^}]+)\}', 
-                           r'\\includegraphics[\1]{images/\3}', 
-                           latex_content)
-    
-    # Handle images without images/ prefix
-    latex_content = re.sub(r'\\includegraphics\[([^\]]*)\]\{([^}]*page_\d+_img_\d+\.png[^}]*)\}', 
-                           r'\\includegraphics[\1]{images/\2}', 
-                           latex_content)
-    
-    # Handle images that already have images/ prefix but wrong format
-    latex_content = re.sub(r'\\includegraphics\[([^\]]*)\]\{([^}]*output/[^}]*page_\d+_img_\d+\.png[^}]*)\}', 
-                           r'\\includegraphics[\1]{images/\2}', 
-                           latex_content)
-    
-    # Count double images paths after fixing
-    double_paths_after = len(re.findall(r'\\includegraphics\[([^\]]*)\]\{images/images/([^}]+)\}', latex_content))
-    
-    # Debug: check if any changes were made
-    if double_paths_before > 0:
-        fixed_count = double_paths_before - double_paths_after
-        print(f"Fixed {fixed_count} double image paths in LaTeX")
+    # Show a few examples of double images/ paths when debugging
+    if logger.isEnabledFor(logging.DEBUG):
+        for size, filename in _DOUBLE_IMAGE_PATH_RE.findall(latex_content)[:3]:
+            logger.debug("  Example: \\includegraphics[%s]{images/images/%s}", size, filename)
+    
+    double_paths_fixed = 0
+    
+    def fix_image_reference(match):
+        nonlocal double_paths_fixed
+        path = match.group(2)
+        
+        # Fix double images/ paths - this is the main issue
+        if path.startswith('images/images/') and len(path) > len('images/images/'):
+            path = path[len('images/'):]
+            double_paths_fixed += 1
+        
+        # Also fix any other double path patterns (<prefix>/images/<file>)
+        nested_idx = path.rfind('/images/', 0, len(path) - 1)
+        if nested_idx != -1:
+            path = 'images/' + path[nested_idx + len('/images/'):]
+        
+        # Point every extracted image (with or without images/ or output/
+        # prefixes) at images/<filename>
+        if _EXTRACTED_IMAGE_NAME_RE.search(path):
+            path = 'images/' + os.path.basename(path)
+        
+        if path == match.group(2):
+            return match.group(0)
+        return f"\\includegraphics[{match.group(1)}]{{{path}}}"
+    
+    # Apply all path fixes to each image reference in a single pass
+    latex_content = _IMAGE_REF_RE.sub(fix_image_reference, latex_content)
+    
+    if double_paths_fixed:
+        logger.debug("Fixed %d double image paths in LaTeX", double_paths_fixed)
     
     return latex_content
+
+
+def _normalize_centering(match: re.Match) -> str:
+    """Put \\centering and its image (and a closing \\end{frame}) on consecutive lines."""
+    if match.group(1) is None:
+        return "\\centering\n\\includegraphics"
+    return f"\\centering\n\\includegraphics{match.group(1)}}}\n\\end{{frame}}"
+
+
+def _line_bounds(text: str, pos: int) -> Tuple[int, int]:
+    """Return the (start, end) offsets of the line containing pos, excluding the newline."""
+    line_start = text.rfind('\n', 0, pos) + 1
+    line_end = text.find('\n', pos)
+    if line_end == -1:
+        line_end = len(text)
+    return line_start, line_end
+
+
+def _line_in_frame(latex_content: str, line_start: int, line_end: int) -> bool:
+    """Whether a line is inside a frame, with \\begin{frame} winning over \\end{frame} on one line."""
+    line = latex_content[line_start:line_end]
+    if '\\begin{frame}' in line:
+        return True
+    if '\\end{frame}' in line:
+        return False
+    
+    # Otherwise the closest earlier line with a frame marker decides
+    last_begin = latex_content.rfind('\\begin{frame}', 0, line_start)
+    last_end = latex_content.rfind('\\end{frame}', 0, line_start)
+    if last_end < last_begin:
+        return True
+    if last_end == -1:
+        return False
+    return last_begin >= latex_content.rfind('\n', 0, last_end) + 1
+
+
+def _remove_lines(text: str, line_spans: List[Tuple[int, int]]) -> str:
+    """Remove whole lines given as ordered (start, end) spans, like filtering text.split('\\n')."""
+    if not line_spans:
+        return text
+    
+    parts = []
+    pos = 0
+    for line_start, line_end in line_spans:
+        parts.append(text[pos:line_start])
+        pos = line_end + 1  # Also drop the line's newline
+    parts.append(text[pos:])
+    result = ''.join(parts)
+    
+    # The last line has no newline of its own; drop the one before it instead
+    if pos > len(text) and result.endswith('\n'):
+        result = result[:-1]
+    return result
@@ -2,29 +2,121 @@
 Utilities for text processing and LaTeX conversion.
 """
 
+import functools
+import io
 import re
 import os
 
 
+# LaTeX special characters
+_ESCAPE_MAP = {
+    '&': '\\&',
+    '%': '\\%',
+    '$': '\\$',
+    '#': '\\#',
+    '^': '\\textasciicircum{}',
+    '_': '\\_',
+    '{': '\\{',
+    '}': '\\}',
+    '~': '\\textasciitilde{}',
+}
+
+# Unicode characters and their LaTeX equivalents
+_UNICODE_MAP = {
+    '−': '-',  # Unicode minus (U+2212)
+    '–': '--',  # En dash
+    '—': '---',  # Em dash
+    '\u201c': '``',  # Left double quotation mark
+    '\u201d': "''",  # Right double quotation mark
+    '…': '...',  # Horizontal ellipsis
+    '°': '$^\\circ$',  # Degree symbol
+    '×': '$\\times$',  # Multiplication sign
+    '÷': '$\\div$',  # Division sign
+    '±': '$\\pm$',  # Plus-minus sign
+    '≤': '$\\leq$',  # Less than or equal to
+    '≥': '$\\geq$',  # Greater than or equal to
+    '≠': '$\\neq$',  # Not equal to
+    '≈': '$\\approx$',  # Approximately equal to
+    '∞': '$\\infty$',  # Infinity
+    '∑': '$\\sum$',  # Summation
+    '∏': '$\\prod$',  # Product
+    '∫': '$\\int$',  # Integral
+    '∂': '$\\partial$',  # Partial derivative
+    '∇': '$\\nabla$',  # Nabla
+    '√': '$\\sqrt{}$',  # Square root
+    '∆': '$\\Delta$',  # Delta
+    '∈': '$\\in$',  # Element of
+    '∉': '$\\notin$',  # Not an element of
+    '⊂': '$\\subset$',  # Subset of
+    '⊃': '$\\supset$',  # Superset of
+    '∪': '$\\cup$',  # Union
+    '∩': '$\\cap$',  # Intersection
+    '∅': '$\\emptyset$',  # Empty set
+    '→': '$\\rightarrow$',  # Right arrow
+    '←': '$\\leftarrow$',  # Left arrow
+    '↔': '$\\leftrightarrow$',  # Left-right arrow
+    '⇒': '$\\Rightarrow$',  # Double right arrow
+    '⇐': '$\\Leftarrow$',  # Double left arrow
+    '⇔': '$\\Leftrightarrow$',  # Double left-right arrow
+}
+
+# Greek letters (common in mathematical text)
+_GREEK_MAP = {
+    'α': '$\\alpha$',
+    'β': '$\\beta$',
+    'γ': '$\\gamma$',
+    'δ': '$\\delta$',
+    'ε': '$\\varepsilon$',
+    'ζ': '$\\zeta$',
+    'η': '$\\eta$',
+    'θ': '$\\theta$',
+    'ι': '$\\iota$',
+    'κ': '$\\kappa$',
+    'λ': '$\\lambda$',
+    'μ': '$\\mu$',
+    'ν': '$\\nu$',
+    'ξ': '$\\xi$',
+    'ο': '$\\omicron$',
+    'π': '$\\pi$',
+    'ρ': '$\\rho$',
+    'σ': '$\\sigma$',
+    'τ': '$\\tau$',
+    'υ': '$\\upsilon$',
+    'φ': '$\\phi$',
+    'χ': '$\\chi$',
+    'ψ': '$\\psi$',
+    'ω': '$\\omega$',
+}
+
+# Translation tables applied in a single pass. Replacements are never
+# rescanned, so the `$...$` inserted for symbols is not escaped again.
+_SYMBOL_TRANS = str.maketrans({**_UNICODE_MAP, **_GREEK_MAP})
+_LATEX_TRANS = str.maketrans({**_ESCAPE_MAP, **_UNICODE_MAP, **_GREEK_MAP})
+
+# Any character convert_text_to_latex would change (or `*` for bold markers)
+_HAS_SPECIAL_RE = re.compile('[' + re.escape(''.join({**_ESCAPE_MAP, **_UNICODE_MAP, **_GREEK_MAP})) + '*]')
+
+
+@functools.lru_cache(maxsize=2048)
 def convert_text_to_latex(text: str) -> str:
-    """Convert plain text to LaTeX with proper escaping."""
+    """Convert plain text to LaTeX with proper escaping (memoized per input)."""
     if not text:
         return ""
     
-    # Convert markdown bold to LaTeX
-    text = re.sub(r'\*\*(.*?)\*\*', r'\\textbf{\1}', text)
+    # Most lines are plain text with nothing to convert
+    if not _HAS_SPECIAL_RE.search(text):
+        return text
     
     # Handle math expressions - don't escape inside $...$
     text = _handle_math_expressions(text)
     
-    # Escape LaTeX special characters (but not inside math mode)
+    # Escape LaTeX special characters (but not inside math mode) and
+    # convert Unicode characters and Greek letters
     text = _escape_latex_characters_smart(text)
     
-    # Fix Unicode characters
-    text = _fix_unicode_characters(text)
-    
-    # Fix Greek letters
-    text = _fix_greek_letters(text)
+    # Convert markdown bold to LaTeX (after escaping so the braces survive)
+    if '**' in text:
+        text = _convert_bold(text)
     
     return text
 
@@ -32,7 +124,7 @@ def convert_text_to_latex(text: str) -> str:
 def convert_markdown_to_latex(markdown_text: str) -> str:
     """Convert basic markdown to LaTeX syntax with proper Beamer frame structure."""
     lines = markdown_text.split('\n')
-    latex_lines = []
+    buf = io.StringIO()
     
     current_frame = False
     frame_count = 0
@@ -46,45 +138,36 @@ def convert_markdown_to_latex(markdown_text: str) -> str:
         if line.startswith('![](') and line.endswith(')'):
             # Extract image path
             img_path = line[4:-1]  # Remove ![]( and )
-            # Only process our custom extracted images (page_X_img_Y.png format)
+            # Only process our custom extracted images (page_X_img_Y.png/.jpg format)
             if 'page_' in img_path and '_img_' in img_path:
                 # Convert to proper image path (images are copied to images/ subdirectory)
                 img_filename = os.path.basename(img_path)
-                latex_lines.append(f"\\includegraphics[width=0.8\\textwidth]{{images/{img_filename}}}")
+                buf.write(f"\\includegraphics[width=0.8\\textwidth]{{images/{img_filename}}}\n")
             # Skip pymupdf4llm images (Paper-Presentation-... format)
             continue
         
-        # Convert markdown bold to LaTeX (handle multiple bold sections)
-        line = re.sub(r'\*\*(.*?)\*\*', r'\\textbf{\1}', line)
-        
-        # Fix LaTeX special characters
-        line = _escape_latex_characters(line)
-        
-        # Fix Unicode characters
-        line = _fix_unicode_characters(line)
-        
-        # Fix Greek letters (common in mathematical text)
-        line = _fix_greek_letters(line)
+        # Fix special characters and convert markdown bold to LaTeX
+        line = _convert_markdown_line(line)
         
         # Convert markdown headers to LaTeX sections
         if line.startswith('#'):
             # Close previous frame if open
             if current_frame:
-                latex_lines.append("\\end{frame}")
+                buf.write("\\end{frame}\n")
                 current_frame = False
             
             # Extract heading text
             heading_text = line.lstrip('#').strip()
             if heading_text:
-                latex_lines.append(f"\\section{{{heading_text}}}")
+                buf.write(f"\\section{{{heading_text}}}\n")
                 frame_count += 1
-                latex_lines.append(f"\\begin{{frame}}{{Slide {frame_count}}}")
+                buf.write(f"\\begin{{frame}}{{Slide {frame_count}}}\n")
                 current_frame = True
         else:
             # Regular content line
             if not current_frame:
                 frame_count += 1
-                latex_lines.append(f"\\begin{{frame}}{{Slide {frame_count}}}")
+                buf.write(f"\\begin{{frame}}{{Slide {frame_count}}}\n")
                 current_frame = True
             
             if line:
@@ -92,13 +175,47 @@ def convert_markdown_to_latex(markdown_text: str) -> str:
                 if line.startswith('\\bibitem{'):
                     # Fix ampersands in bibliography
                     line = line.replace('&', '\\&')
-                latex_lines.append(line)
+                buf.write(line)
+                buf.write('\n')
     
     # Close final frame if open
     if current_frame:
-        latex_lines.append("\\end{frame}")
+        buf.write("\\end{frame}\n")
+    
+    # Drop the newline after the last line
+    return buf.getvalue()[:-1]
+
+
+@functools.lru_cache(maxsize=2048)
+def _convert_markdown_line(line: str) -> str:
+    """Convert one markdown line; memoized since slides repeat many lines."""
+    # Fix LaTeX special characters, Unicode characters and Greek letters
+    line = line.translate(_LATEX_TRANS)
+    
+    # Convert markdown bold to LaTeX (handle multiple bold sections)
+    if '**' in line:
+        line = _convert_bold(line)
+    
+    return line
+
+
+def _convert_bold(text: str) -> str:
+    """Convert **bold** markers to \\textbf{...} without a regex."""
+    # Bold never spans lines
+    if '\n' in text:
+        return '\n'.join(_convert_bold(line) for line in text.split('\n'))
+    
+    # Odd indices are the bold parts
+    parts = text.split('**')
+    tail = ''
+    if len(parts) % 2 == 0:
+        # Unmatched final marker stays literal
+        tail = '**' + parts.pop()
+    
+    for i in range(1, len(parts), 2):
+        parts[i] = f"\\textbf{{{parts[i]}}}"
     
-    return '\n'.join(latex_lines)
+    return ''.join(parts) + tail
 
 
 def _handle_math_expressions(text: str) -> str:
@@ -109,97 +226,46 @@ def _handle_math_expressions(text: str) -> str:
 
 def _escape_latex_characters_smart(text: str) -> str:
     """Escape LaTeX special characters, but not inside math mode."""
-    # Split text into math and non-math parts
-    parts = re.split(r'(\$[^$]*\$)', text)
+    # Jump between math delimiters with str.find: $...$ and $$...$$ are math,
+    # an escaped \$ is literal, and an unmatched $ or $$ is escaped as text
     result = []
+    start = 0  # Start of the pending non-math part
+    pos = text.find('$')
     
-    for i, part in enumerate(parts):
-        if i % 2 == 0:  # Non-math part
-            result.append(_escape_latex_characters(part))
-        else:  # Math part - don't escape
-            result.append(part)
+    while pos != -1:
+        if pos and text[pos - 1] == '\\':
+            # Already escaped dollar - keep it as is
+            result.append(text[start:pos - 1].translate(_LATEX_TRANS))
+            result.append('\\$')
+            start = pos + 1
+            pos = text.find('$', start)
+            continue
+        
+        delimiter = '$$' if text.startswith('$$', pos) else '$'
+        end = _find_unescaped(text, delimiter, pos + len(delimiter))
+        if end == -1:
+            if delimiter == '$':
+                break
+            # Unmatched $$ - escape it as text and keep looking for math after it
+            result.append(text[start:pos].translate(_LATEX_TRANS))
+            result.append('\\$\\$')
+            start = pos + 2
+            pos = text.find('$', start)
+            continue
+        end += len(delimiter)
+        
+        result.append(text[start:pos].translate(_LATEX_TRANS))  # Non-math part
+        result.append(text[pos:end].translate(_SYMBOL_TRANS))  # Math part - don't escape, only convert symbols
+        start = end
+        pos = text.find('$', start)
     
+    result.append(text[start:].translate(_LATEX_TRANS))
     return ''.join(result)
 
 
-def _escape_latex_characters(text: str) -> str:
-    """Escape LaTeX special characters."""
-    text = text.replace('&', '\\&')
-    text = text.replace('%', '\\%')
-    text = text.replace('$', '\\$')
-    text = text.replace('#', '\\#')
-    text = text.replace('^', '\\textasciicircum{}')
-    text = text.replace('_', '\\_')
-    text = text.replace('{', '\\{')
-    text = text.replace('}', '\\}')
-    text = text.replace('~', '\\textasciitilde{}')
-    return text
-
-
-def _fix_unicode_characters(text: str) -> str:
-    """Fix Unicode characters to LaTeX equivalents."""
-    text = text.replace('−', '-')  # Unicode minus (U+2212)
-    text = text.replace('–', '--')  # En dash
-    text = text.replace('—', '---')  # Em dash
-    text = text.replace('"', '``')  # Left double quotation mark
-    text = text.replace('"', "''")  # Right double quotation mark
-    text = text.replace('…', '...')  # Horizontal ellipsis
-    text = text.replace('°', '$^\\circ$')  # Degree symbol
-    text = text.replace('×', '$\\times$')  # Multiplication sign
-    text = text.replace('÷', '$\\div$')  # Division sign
-    text = text.replace('±', '$\\pm$')  # Plus-minus sign
-    text = text.replace('≤', '$\\leq$')  # Less than or equal to
-    text = text.replace('≥', '$\\geq$')  # Greater than or equal to
-    text = text.replace('≠', '$\\neq$')  # Not equal to
-    text = text.replace('≈', '$\\approx$')  # Approximately equal to
-    text = text.replace('∞', '$\\infty$')  # Infinity
-    text = text.replace('∑', '$\\sum$')  # Summation
-    text = text.replace('∏', '$\\prod$')  # Product
-    text = text.replace('∫', '$\\int$')  # Integral
-    text = text.replace('∂', '$\\partial$')  # Partial derivative
-    text = text.replace('∇', '$\\nabla$')  # Nabla
-    text = text.replace('√', '$\\sqrt{}$')  # Square root
-    text = text.replace('∆', '$\\Delta$')  # Delta
-    text = text.replace('∈', '$\\in$')  # Element of
-    text = text.replace('∉', '$\\notin$')  # Not an element of
-    text = text.replace('⊂', '$\\subset$')  # Subset of
-    text = text.replace('⊃', '$\\supset$')  # Superset of
-    text = text.replace('∪', '$\\cup$')  # Union
-    text = text.replace('∩', '$\\cap$')  # Intersection
-    text = text.replace('∅', '$\\emptyset$')  # Empty set
-    text = text.replace('→', '$\\rightarrow$')  # Right arrow
-    text = text.replace('←', '$\\leftarrow$')  # Left arrow
-    text = text.replace('↔', '$\\leftrightarrow$')  # Left-right arrow
-    text = text.replace('⇒', '$\\Rightarrow$')  # Double right arrow
-    text = text.replace('⇐', '$\\Leftarrow$')  # Double left arrow
-    text = text.replace('⇔', '$\\Leftrightarrow$')  # Double left-right arrow
-    return text
-
-
-def _fix_greek_letters(text: str) -> str:
-    """Fix Greek letters to LaTeX equivalents."""
-    text = text.replace('α', '$\\alpha$')
-    text = text.replace('β', '$\\beta$')
-    text = text.replace('γ', '$\\gamma$')
-    text = text.replace('δ', '$\\delta$')
-    text = text.replace('ε', '$\\varepsilon$')
-    text = text.replace('ζ', '$\\zeta$')
-    text = text.replace('η', '$\\eta$')
-    text = text.replace('θ', '$\\theta$')
-    text = text.replace('ι', '$\\iota$')
-    text = text.replace('κ', '$\\kappa$')
-    text = text.replace('λ', '$\\lambda$')
-    text = text.replace('μ', '$\\mu$')
-    text = text.replace('ν', '$\\nu$')
-    text = text.replace('ξ', '$\\xi$')
-    text = text.replace('ο', '$\\omicron$')
-    text = text.replace('π', '$\\pi$')
-    text = text.replace('ρ', '$\\rho$')
-    text = text.replace('σ', '$\\sigma$')
-    text = text.replace('τ', '$\\tau$')
-    text = text.replace('υ', '$\\upsilon$')
-    text = text.replace('φ', '$\\phi$')
-    text = text.replace('χ', '$\\chi$')
-    text = text.replace('ψ', '$\\psi$')
-    text = text.replace('ω', '$\\omega$')
-    return text
+def _find_unescaped(text: str, delimiter: str, start: int) -> int:
+    """Return the index of the next delimiter not preceded by a backslash, or -1."""
+    pos = text.find(delimiter, start)
+    while pos != -1 and text[pos - 1] == '\\':
+        pos = text.find(delimiter, pos + 1)
+    return pos
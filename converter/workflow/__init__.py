@@ -2,13 +2,14 @@
 Workflow modules for the 3-stage conversion process.
 """
 
-from .stage1_basic_latex import create_basic_latex_structure, extract_page_structure
+from .stage1_basic_latex import create_basic_latex_structure, extract_page_structure, extract_page_titles
 from .stage2_image_analysis import analyze_all_images
 from .stage3_llm_placement import place_images_in_latex
 
 __all__ = [
     'create_basic_latex_structure',
     'extract_page_structure', 
+    'extract_page_titles',
     'analyze_all_images',
     'place_images_in_latex'
 ]
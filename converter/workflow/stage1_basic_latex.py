@@ -2,103 +2,131 @@
 Stage 1: Extract markdown and render basic LaTeX structure.
 """
 
+import io
 import os
-from typing import Dict, List, Any
-from ..utils.text_processing import convert_markdown_to_latex
+from typing import Dict, List, Any, Optional
+from ..utils.text_processing import convert_markdown_to_latex, convert_text_to_latex
 
 
-def create_basic_latex_structure(extracted_data: Dict[str, Any]) -> str:
+def extract_page_titles(markdown_content: Any) -> List[Optional[str]]:
+    """
+    Return the toc_items title of each page chunk, or None where it has none.
+    
+    Computed once per document and shared by the stages that label pages.
+    """
+    if not isinstance(markdown_content, list):
+        return []
+    
+    page_titles = []
+    for page_data in markdown_content:
+        page_title = None
+        if isinstance(page_data, dict) and 'toc_items' in page_data.get('metadata', {}):
+            toc_items = page_data['metadata']['toc_items']
+            if toc_items and len(toc_items[0]) > 1:
+                page_title = toc_items[0][1]
+        page_titles.append(page_title)
+    
+    return page_titles
+
+
+def create_basic_latex_structure(extracted_data: Dict[str, Any], page_titles: Optional[List[Optional[str]]] = None) -> str:
     """
     Stage 1: Create basic LaTeX structure from markdown content.
     This creates the foundation without any images.
+    
+    page_titles is the result of extract_page_titles; it is computed here
+    when not provided by the caller.
     """
     markdown_content = extracted_data.get("markdown", "")
     
     # Start with document structure
-    latex_lines = [
-        "\\begin{frame}{Contents}",
-        "    \\tableofcontents",
-        "\\end{frame}",
-        ""
-    ]
+    buf = io.StringIO()
+    buf.write("\\begin{frame}{Contents}\n")
+    buf.write("    \\tableofcontents\n")
+    buf.write("\\end{frame}\n")
+    buf.write("\n")
     
     # Handle structured data from pymupdf4llm
     if isinstance(markdown_content, list):
         # Convert list of page data to LaTeX frames
+        if page_titles is None:
+            page_titles = extract_page_titles(markdown_content)
         current_frame = False
         frame_count = 0
         
-        for page_data in markdown_content:
+        for page_data, toc_title in zip(markdown_content, page_titles):
             if isinstance(page_data, dict):
                 # Start new frame for each page
                 if current_frame:
-                    latex_lines.append("\\end{frame}")
+                    buf.write("\\end{frame}\n")
                     current_frame = False
                 
                 frame_count += 1
-                page_title = f"Slide {frame_count}"
-                
-                # Get page title from toc_items if available
-                if 'toc_items' in page_data.get('metadata', {}):
-                    toc_items = page_data['metadata']['toc_items']
-                    if toc_items and len(toc_items) > 0:
-                        page_title = toc_items[0][1] if len(toc_items[0]) > 1 else f"Slide {frame_count}"
+                # Use the page title from toc_items if available
+                page_title = toc_title if toc_title is not None else f"Slide {frame_count}"
                 
-                latex_lines.append(f"\\begin{{frame}}{{{page_title}}}")
+                buf.write(f"\\begin{{frame}}{{{page_title}}}\n")
                 current_frame = True
                 
                 # Add text content
                 text_content = page_data.get('text', '')
                 if text_content:
                     # Convert text to LaTeX
-                    from ..utils.text_processing import convert_text_to_latex
                     latex_text = convert_text_to_latex(text_content)
-                    latex_lines.append(latex_text)
+                    buf.write(latex_text)
+                    buf.write("\n")
         
         # Close final frame
         if current_frame:
-            latex_lines.append("\\end{frame}")
+            buf.write("\\end{frame}\n")
         
-        return "\n".join(latex_lines)
+        # Drop the newline after the last line
+        return buf.getvalue()[:-1]
     
     # Fallback for string format
     latex_content = convert_markdown_to_latex(markdown_content)
     return latex_content
 
 
-def extract_page_structure(extracted_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+def extract_page_structure(extracted_data: Dict[str, Any], page_titles: Optional[List[Optional[str]]] = None) -> List[Dict[str, Any]]:
     """
     Extract page structure information for image placement.
+    
+    page_titles is the result of extract_page_titles; it is computed here
+    when not provided by the caller.
     """
     markdown_content = extracted_data.get("markdown", "")
     page_structure = []
     
     if isinstance(markdown_content, list):
-        for i, page_data in enumerate(markdown_content):
+        if page_titles is None:
+            page_titles = extract_page_titles(markdown_content)
+        
+        # Bucket images by page once instead of scanning all images per page
+        images_by_page = {}
+        for img in extracted_data.get("images", []):
+            images_by_page.setdefault(img.get('page', 0), []).append(img)
+        
+        for i, (page_data, toc_title) in enumerate(zip(markdown_content, page_titles)):
             if isinstance(page_data, dict):
+                text_content = page_data.get('text', '')
                 page_info = {
                     'page_number': i + 1,
-                    'title': f"Slide {i + 1}",
-                    'content_preview': page_data.get('text', '')[:200] + "..." if len(page_data.get('text', '')) > 200 else page_data.get('text', ''),
+                    # Use the page title from toc_items if available
+                    'title': toc_title if toc_title is not None else f"Slide {i + 1}",
+                    'content_preview': text_content[:200] + "..." if len(text_content) > 200 else text_content,
                     'has_images': False,
                     'images': []
                 }
                 
-                # Get page title from toc_items if available
-                if 'toc_items' in page_data.get('metadata', {}):
-                    toc_items = page_data['metadata']['toc_items']
-                    if toc_items and len(toc_items) > 0:
-                        page_info['title'] = toc_items[0][1] if len(toc_items[0]) > 1 else f"Slide {i + 1}"
-                
                 # Find images for this page
-                for img in extracted_data.get("images", []):
-                    if img.get('page', 0) == i:
-                        page_info['has_images'] = True
-                        page_info['images'].append({
-                            'filename': os.path.basename(img['path']),
-                            'path': img['path'],
-                            'page': img.get('page', 0)
-                        })
+                for img in images_by_page.get(i, []):
+                    page_info['has_images'] = True
+                    page_info['images'].append({
+                        'filename': os.path.basename(img['path']),
+                        'path': img['path'],
+                        'page': img.get('page', 0)
+                    })
                 
                 page_structure.append(page_info)
     
@@ -4,55 +4,41 @@ Stage 2: Analyze all images and convert tables/formulas to LaTeX.
 
 import os
 import base64
+import json
+import logging
+import mimetypes
 import re
-from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Set
 from ..services import GeminiService
-from ..exceptions import ImageProcessingError
+from ..exceptions import APIError, ImageProcessingError
+from ..utils.file_processing import find_existing_paths
+from .stage1_basic_latex import extract_page_titles
 
+logger = logging.getLogger(__name__)
 
-def analyze_all_images(extracted_data: Dict[str, Any], gemini_service: GeminiService) -> Dict[str, Any]:
-    """
-    Stage 2: Analyze all images and decide what to convert vs keep.
-    """
-    images = extracted_data.get("images", [])
-    if not images:
-        return {"image_decisions": {}}
-    
-    # Prepare images for analysis
-    images_with_context = []
-    for img_data in images:
-        if os.path.exists(img_data["path"]):
-            images_with_context.append({
-                "filename": os.path.basename(img_data["path"]),
-                "page": img_data["page"] + 1,
-                "path": img_data["path"],
-                "mime_type": "image/png"
-            })
-    
-    # Create analysis prompt
-    analysis_prompt = create_image_analysis_prompt(extracted_data, images_with_context)
-    
-    # Analyze images using Gemini
-    response = gemini_service.analyze_images(analysis_prompt, images_with_context)
-    
-    # Parse response
-    plan = parse_image_analysis_response(response, images_with_context)
-    
-    return plan
+# Images analyzed per Gemini request. Every request repeats the instructions
+# and the presentation outline, so images are batched rather than sent one
+# by one; small presentations need a single request
+ANALYSIS_BATCH_SIZE = 10
 
+# Upper bound on concurrent Gemini calls during image analysis
+MAX_ANALYSIS_WORKERS = 8
 
-def create_image_analysis_prompt(extracted_data: dict, images: list) -> str:
-    """Create the image analysis prompt."""
-    structure = _extract_presentation_structure(extracted_data.get("markdown", ""))
-    image_list = _create_image_list(images)
-    
-    return f"""
-You are analyzing images from a PDF presentation to determine the best processing strategy.
+# Fix-ups for malformed JSON in LLM responses
+# A backslash and, if it starts a real JSON escape, what it escapes. \b \f
+# \n \r \t followed by a letter are LaTeX commands (\frac, \begin, \textbf)
+# and \u only counts with four hex digits (not \underline)
+_JSON_ESCAPE_RE = re.compile(r'\\(\\|"|/|u[0-9a-fA-F]{4}|[bfnrt](?![A-Za-z]))?')
+# Missing commas between objects and trailing commas, outside string
+# literals: a whole string is matched first so LaTeX like \frac{1}{2} is kept
+_JSON_COMMA_RE = re.compile(r'("(?:[^"\\]|\\.)*")|}\s*{|,\s*([}\]])', re.DOTALL)
 
-{structure}
-
-IMAGES TO ANALYZE:
-{image_list}
+# Instructions shared by every analysis prompt; the presentation structure
+# and the image list follow them
+STATIC_ANALYSIS_INSTRUCTIONS = """
+You are analyzing images from a PDF presentation to determine the best processing strategy.
+The presentation structure and the images to analyze are given after these instructions.
 
 FOR EACH IMAGE, decide one of these actions:
 
@@ -75,84 +61,203 @@ FOR EACH IMAGE, decide one of these actions:
    - Not relevant to the presentation content
 
 RESPONSE FORMAT (JSON):
-{{
-  "image_decisions": {{
-    "filename.png": {{
+{
+  "image_decisions": {
+    "filename.png": {
       "action": "CONVERT_TO_LATEX|KEEP_AS_IMAGE|REMOVE",
       "reasoning": "Brief explanation of decision",
       "latex_content": "LaTeX code if CONVERT_TO_LATEX, null otherwise",
       "image_type": "table|formula|diagram|chart|photo|other",
       "complexity": "simple|medium|complex"
-    }}
-  }}
-}}
+    }
+  }
+}
 """
 
 
-def parse_image_analysis_response(response_content: str, images: List[Dict]) -> Dict[str, Any]:
-    """Parse the LLM response from image analysis."""
-    # Extract JSON from the response
-    json_start = response_content.find('{')
-    json_end = response_content.rfind('}') + 1
+def analyze_all_images(extracted_data: Dict[str, Any], gemini_service: GeminiService, existing_paths: Optional[Set[str]] = None, page_titles: Optional[List[Optional[str]]] = None) -> Dict[str, Any]:
+    """
+    Stage 2: Analyze all images and decide what to convert vs keep.
     
-    if json_start == -1 or json_end <= json_start:
-        raise ValueError("No valid JSON found in image analysis response")
+    existing_paths is the set of image paths known to exist on disk, and
+    page_titles the result of extract_page_titles; both are computed here
+    when not provided by the caller.
+    """
+    images = extracted_data.get("images", [])
+    if not images:
+        return {"image_decisions": {}}
+    
+    if existing_paths is None:
+        existing_paths = find_existing_paths(img["path"] for img in images)
+    
+    # Prepare images for analysis
+    images_with_context = []
+    for img_data in images:
+        if img_data["path"] in existing_paths:
+            images_with_context.append({
+                "filename": os.path.basename(img_data["path"]),
+                "page": img_data["page"] + 1,
+                "path": img_data["path"],
+                "mime_type": mimetypes.guess_type(img_data["path"])[0] or "image/png"
+            })
+    
+    if not images_with_context:
+        return {"image_decisions": {}}
+    
+    if page_titles is None:
+        page_titles = extract_page_titles(extracted_data.get("markdown", ""))
+    
+    batches = [
+        images_with_context[i:i + ANALYSIS_BATCH_SIZE]
+        for i in range(0, len(images_with_context), ANALYSIS_BATCH_SIZE)
+    ]
+    if len(batches) == 1:
+        return _analyze_batch(extracted_data, batches[0], gemini_service, page_titles)
+    
+    # The batches are network-bound and independent, so analyze them
+    # concurrently
+    with ThreadPoolExecutor(max_workers=min(MAX_ANALYSIS_WORKERS, len(batches))) as executor:
+        futures = [
+            executor.submit(_analyze_batch, extracted_data, batch, gemini_service, page_titles)
+            for batch in batches
+        ]
+    
+    # Merge the decisions of the batches that succeeded; a failed batch only
+    # loses the decisions for its own images
+    image_decisions = {}
+    errors = []
+    for batch, future in zip(batches, futures):
+        try:
+            plan = future.result()
+        except (APIError, ValueError) as e:
+            logger.warning("Image analysis failed for %s: %s", ", ".join(img["filename"] for img in batch), e)
+            errors.append(e)
+            continue
+        image_decisions.update(plan.get("image_decisions", {}))
+    
+    if len(errors) == len(batches):
+        raise errors[0]
+    
+    return {"image_decisions": image_decisions}
+
+
+def _analyze_batch(extracted_data: Dict[str, Any], images: List[Dict[str, Any]], gemini_service: GeminiService, page_titles: List[Optional[str]]) -> Dict[str, Any]:
+    """Analyze a batch of images in one request and return the parsed plan."""
+    # Create analysis prompt
+    analysis_prompt = create_image_analysis_prompt(extracted_data, images, page_titles)
     
-    json_str = response_content[json_start:json_end]
-    import json
+    # Analyze images using Gemini; only parseable responses are cached
+    response = gemini_service.analyze_images(analysis_prompt, images, is_valid_image_analysis_response)
+    
+    # Parse response
+    return parse_image_analysis_response(response, images)
+
+
+def create_image_analysis_prompt(extracted_data: dict, images: list, page_titles: Optional[List[Optional[str]]] = None) -> str:
+    """Create the image analysis prompt."""
+    structure = _extract_presentation_structure(extracted_data.get("markdown", ""), page_titles)
+    image_list = _create_image_list(images)
+    
+    # Static instructions first so repeated requests share a common prefix
+    return f"""{STATIC_ANALYSIS_INSTRUCTIONS}
+{structure}
+
+IMAGES TO ANALYZE:
+{image_list}
+"""
+
+
+def parse_image_analysis_response(response_content: str, images: List[Dict]) -> Dict[str, Any]:
+    """Parse the LLM response from image analysis."""
+    json_str = _extract_json(response_content)
     
     try:
         return json.loads(json_str)
     except json.JSONDecodeError as e:
-        print(f"JSON parsing error: {e}")
-        print(f"JSON string: {json_str[:500]}...")
-        
-        # Try to fix common JSON issues
-        # Fix unescaped backslashes
-        json_str = json_str.replace('\\', '\\\\')
-        
-        # Fix missing commas between objects
-        json_str = re.sub(r'}\s*{', '},{', json_str)
-        
-        # Fix trailing commas
-        json_str = re.sub(r',\s*}', '}', json_str)
-        json_str = re.sub(r',\s*]', ']', json_str)
+        logger.warning("JSON parsing error: %s", e)
+        logger.debug("JSON string: %s...", json_str[:500])
         
         try:
-            return json.loads(json_str)
+            return _loads_repaired_json(json_str)
         except json.JSONDecodeError as e2:
-            print(f"Still failed after fixes: {e2}")
+            logger.warning("Still failed after fixes: %s", e2)
             # Return a minimal valid response
             return {"image_decisions": {}}
 
 
+def is_valid_image_analysis_response(response_content: str) -> bool:
+    """Check if a response parses into an analysis plan, without logging."""
+    try:
+        json_str = _extract_json(response_content)
+        try:
+            plan = json.loads(json_str)
+        except json.JSONDecodeError:
+            plan = _loads_repaired_json(json_str)
+    except ValueError:
+        return False
+    return isinstance(plan, dict)
 
 
-def _extract_presentation_structure(markdown_content) -> str:
+def _extract_json(response_content: str) -> str:
+    """Return the outermost {...} of a response."""
+    json_start = response_content.find('{')
+    json_end = response_content.rfind('}') + 1
+    
+    if json_start == -1 or json_end <= json_start:
+        raise ValueError("No valid JSON found in image analysis response")
+    
+    return response_content[json_start:json_end]
+
+
+def _loads_repaired_json(json_str: str) -> Any:
+    """Parse JSON after fixing common LLM mistakes."""
+    # Fix unescaped backslashes (e.g. LaTeX commands), keeping real escapes
+    json_str = _JSON_ESCAPE_RE.sub(_escape_invalid_backslash, json_str)
+    
+    # Fix missing commas between objects and trailing commas
+    json_str = _JSON_COMMA_RE.sub(_fix_json_comma, json_str)
+    
+    # strict=False accepts raw newlines and tabs inside strings
+    return json.loads(json_str, strict=False)
+
+
+def _escape_invalid_backslash(match: re.Match) -> str:
+    """Double a backslash that does not start a real JSON escape."""
+    return match.group(0) if match.group(1) else '\\\\'
+
+
+def _fix_json_comma(match: re.Match) -> str:
+    """Keep string literals, add a missing comma or drop a trailing one."""
+    if match.group(1):
+        return match.group(1)
+    if match.group(2):
+        return match.group(2)
+    return '},{'
+
+
+def _extract_presentation_structure(markdown_content, page_titles: Optional[List[Optional[str]]] = None) -> str:
     """Extract the logical structure of the presentation."""
+    structure_lines = ["PRESENTATION OUTLINE:"]
+    
     if isinstance(markdown_content, list):
         # Handle pymupdf4llm page chunks
-        structure = "PRESENTATION OUTLINE:\n"
-        for i, page_data in enumerate(markdown_content):
+        if page_titles is None:
+            page_titles = extract_page_titles(markdown_content)
+        for i, (page_data, toc_title) in enumerate(zip(markdown_content, page_titles)):
             if isinstance(page_data, dict):
-                page_title = f"Page {i+1}"
-                if 'toc_items' in page_data.get('metadata', {}):
-                    toc_items = page_data['metadata']['toc_items']
-                    if toc_items and len(toc_items) > 0:
-                        page_title = toc_items[0][1] if len(toc_items[0]) > 1 else page_title
+                page_title = toc_title if toc_title is not None else f"Page {i+1}"
                 
                 # Get first few lines of content for context
                 text_content = page_data.get('text', '')[:200]
-                structure += f"- {page_title}: {text_content}...\n"
+                structure_lines.append(f"- {page_title}: {text_content}...")
     else:
         # Handle string markdown
-        lines = markdown_content.split('\n')
-        structure = "PRESENTATION OUTLINE:\n"
-        for line in lines:
+        for line in markdown_content.split('\n'):
             if line.startswith('#'):
-                structure += f"- {line.strip()}\n"
+                structure_lines.append(f"- {line.strip()}")
     
-    return structure
+    structure_lines.append("")  # Keep the trailing newline
+    return "\n".join(structure_lines)
 
 
 def _create_image_list(images: list) -> str:
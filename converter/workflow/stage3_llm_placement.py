@@ -2,11 +2,52 @@
 Stage 3: Use LLM to intelligently place images in the LaTeX structure.
 """
 
+import logging
 import os
 from typing import Dict, List, Any
 from ..services import GeminiService
 from ..exceptions import LatexGenerationError
 
+logger = logging.getLogger(__name__)
+
+# Instructions shared by every placement prompt; the per-presentation
+# sections follow them
+STATIC_PLACEMENT_INSTRUCTIONS = """
+You are placing images and LaTeX conversions into a LaTeX Beamer presentation.
+The current LaTeX structure, the images to place and the LaTeX conversions to
+integrate are given after these instructions.
+
+CRITICAL PLACEMENT STRATEGY:
+1. **MANDATORY NEW FRAMES FOR IMAGES**: For EVERY image in the "IMAGES TO PLACE" list, you MUST create a completely new frame. DO NOT place images within existing frames.
+
+2. **INTEGRATE CONVERSIONS**: Place LaTeX conversions in appropriate existing frames where they fit naturally
+
+3. **MAINTAIN FLOW**: Ensure the presentation flows logically with new image frames inserted appropriately
+
+4. **PROPER SIZING**: Use appropriate image sizes (width=0.7\\textwidth for most images)
+
+STRICT INSTRUCTIONS:
+1. For EACH image in the "IMAGES TO PLACE" list, create a NEW frame with:
+   - A descriptive title based on the page content and image context
+   - The image centered using \\centering
+   - Proper image sizing: \\includegraphics[width=0.7\\textwidth]{images/filename.png} (keep each image's own .png or .jpg extension)
+   - IMPORTANT: Use exactly "images/filename.png" - do NOT use "images/images/filename.png"
+   - Optional brief description if the image needs context
+
+2. For LaTeX conversions, integrate them into existing frames where appropriate
+
+3. Maintain the original presentation structure and flow
+
+4. Use proper LaTeX syntax and Beamer frame structure
+
+5. Ensure all \\begin{frame} have matching \\end{frame}
+
+6. **DO NOT** place images within existing frames - they must get their own frames
+
+OUTPUT FORMAT:
+Return the complete LaTeX presentation body with images in NEW frames and conversions properly placed.
+"""
+
 
 def place_images_in_latex(basic_latex: str, page_structure: List[Dict], image_plan: Dict, gemini_service: GeminiService, extracted_data: Dict[str, Any]) -> str:
     """
@@ -21,8 +62,8 @@ def place_images_in_latex(basic_latex: str, page_structure: List[Dict], image_pl
     # Get images that need to be placed
     images_to_place = get_images_to_place(image_plan, extracted_data)
     
-    # Use LLM to place images
-    response = gemini_service.generate_latex(placement_prompt, images_to_place)
+    # Use LLM to place images; only responses with frames are cached
+    response = gemini_service.generate_latex(placement_prompt, images_to_place, _has_frames)
     
     # Clean and validate the response
     from ..utils.latex_processing import clean_latex_response, validate_frame_structure
@@ -32,10 +73,21 @@ def place_images_in_latex(basic_latex: str, page_structure: List[Dict], image_pl
     return final_latex
 
 
+def _has_frames(response: str) -> bool:
+    """Check if a placement response contains a presentation body."""
+    return '\\begin{frame}' in response
+
+
 def prepare_image_placement_data(page_structure: List[Dict], image_plan: Dict) -> Dict[str, Any]:
     """Prepare data for image placement."""
     decisions = image_plan.get("image_decisions", {})
     
+    # The page each image came from, indexed once instead of per decision
+    page_by_filename = {}
+    for page in page_structure:
+        for img in page.get('images', []):
+            page_by_filename.setdefault(img['filename'], page)
+    
     # Separate images by action
     images_to_place = []
     latex_conversions = []
@@ -44,17 +96,14 @@ def prepare_image_placement_data(page_structure: List[Dict], image_plan: Dict) -
         action = decision.get("action")
         
         if action == "KEEP_AS_IMAGE":
-            # Find the page this image came from
-            for page in page_structure:
-                for img in page.get('images', []):
-                    if img['filename'] == filename:
-                        images_to_place.append({
-                            'filename': filename,
-                            'page': page['page_number'],
-                            'page_title': page['title'],
-                            'content_preview': page['content_preview']
-                        })
-                        break
+            page = page_by_filename.get(filename)
+            if page is not None:
+                images_to_place.append({
+                    'filename': filename,
+                    'page': page['page_number'],
+                    'page_title': page['title'],
+                    'content_preview': page['content_preview']
+                })
         
         elif action == "CONVERT_TO_LATEX" and decision.get("latex_content"):
             latex_conversions.append({
@@ -74,62 +123,27 @@ def create_image_placement_prompt(basic_latex: str, placement_data: Dict[str, An
     """Create the image placement prompt."""
     images_to_place = placement_data['images_to_place']
     latex_conversions = placement_data['latex_conversions']
-    page_structure = placement_data['page_structure']
     
-    # Create image list
-    image_list = "\n".join([
-        f"- {img['filename']} (from page {img['page']}: {img['page_title']})"
-        for img in images_to_place
-    ])
+    # Static instructions first so repeated requests share a common prefix;
+    # the sections are collected as parts and joined once
+    parts = [STATIC_PLACEMENT_INSTRUCTIONS, "\nCURRENT LATEX STRUCTURE:\n", basic_latex]
     
-    # Create LaTeX conversions list
-    conversions_list = "\n\n".join([
-        f"**{conv['filename']}** ({conv['image_type']}):\n{conv['latex_content']}"
-        for conv in latex_conversions
-    ])
+    # Image list
+    parts.append("\n\nIMAGES TO PLACE:\n")
+    separator = ""
+    for img in images_to_place:
+        parts.append(f"{separator}- {img['filename']} (from page {img['page']}: {img['page_title']})")
+        separator = "\n"
     
-    return f"""
-You are placing images and LaTeX conversions into a LaTeX Beamer presentation.
-
-CURRENT LATEX STRUCTURE:
-{basic_latex}
-
-IMAGES TO PLACE:
-{image_list}
-
-LATEX CONVERSIONS TO INTEGRATE:
-{conversions_list}
-
-CRITICAL PLACEMENT STRATEGY:
-1. **MANDATORY NEW FRAMES FOR IMAGES**: For EVERY image in the "IMAGES TO PLACE" list, you MUST create a completely new frame. DO NOT place images within existing frames.
-
-2. **INTEGRATE CONVERSIONS**: Place LaTeX conversions in appropriate existing frames where they fit naturally
-
-3. **MAINTAIN FLOW**: Ensure the presentation flows logically with new image frames inserted appropriately
-
-4. **PROPER SIZING**: Use appropriate image sizes (width=0.7\\textwidth for most images)
-
-STRICT INSTRUCTIONS:
-1. For EACH image in the "IMAGES TO PLACE" list, create a NEW frame with:
-   - A descriptive title based on the page content and image context
-   - The image centered using \\centering
-   - Proper image sizing: \\includegraphics[width=0.7\\textwidth]{{images/filename.png}}
-   - IMPORTANT: Use exactly "images/filename.png" - do NOT use "images/images/filename.png"
-   - Optional brief description if the image needs context
-
-2. For LaTeX conversions, integrate them into existing frames where appropriate
-
-3. Maintain the original presentation structure and flow
-
-4. Use proper LaTeX syntax and Beamer frame structure
-
-5. Ensure all \\begin{{frame}} have matching \\end{{frame}}
-
-6. **DO NOT** place images within existing frames - they must get their own frames
-
-OUTPUT FORMAT:
-Return the complete LaTeX presentation body with images in NEW frames and conversions properly placed.
-"""
+    # LaTeX conversions list
+    parts.append("\n\nLATEX CONVERSIONS TO INTEGRATE:\n")
+    separator = ""
+    for conv in latex_conversions:
+        parts.append(f"{separator}**{conv['filename']}** ({conv['image_type']}):\n{conv['latex_content']}")
+        separator = "\n\n"
+    
+    parts.append("\n")
+    return "".join(parts)
 
 
 def get_images_to_place(image_plan: Dict, extracted_data: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -137,17 +151,20 @@ def get_images_to_place(image_plan: Dict, extracted_data: Dict[str, Any]) -> Lis
     decisions = image_plan.get("image_decisions", {})
     images_to_place = []
     
+    # The actual image path for each filename; the first image wins on duplicates
+    path_by_filename = {}
+    for img in extracted_data.get("images", []):
+        path_by_filename.setdefault(os.path.basename(img["path"]), img["path"])
+    
     for filename, decision in decisions.items():
         if decision.get("action") == "KEEP_AS_IMAGE":
-            # Find the actual image path from extracted data
-            for img in extracted_data.get("images", []):
-                if os.path.basename(img["path"]) == filename:
-                    images_to_place.append({
-                        "filename": filename,
-                        "path": img["path"]
-                    })
-                    print(f"Image to place: {filename} -> {img['path']}")
-                    break
+            path = path_by_filename.get(filename)
+            if path is not None:
+                images_to_place.append({
+                    "filename": filename,
+                    "path": path
+                })
+                logger.debug("Image to place: %s -> %s", filename, path)
     
     return images_to_place
 
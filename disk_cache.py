@@ -0,0 +1,43 @@
+"""
+Disk Cache Module
+Location of and atomic writes to the results cached between runs.
+"""
+
+import os
+import shutil
+import tempfile
+from typing import Callable
+
+# Root of everything cached between runs (compiled PDFs, Gemini responses)
+CACHE_ROOT = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "slidegen")
+
+
+def store_bytes(dest_path: str, data: bytes) -> None:
+    """Store data at dest_path in the cache."""
+    def write(tmp_path: str) -> None:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+    
+    _store(dest_path, write)
+
+
+def store_copy(source_path: str, dest_path: str) -> None:
+    """Store a copy of source_path at dest_path in the cache."""
+    _store(dest_path, lambda tmp_path: shutil.copyfile(source_path, tmp_path))
+
+
+def _store(dest_path: str, write: Callable[[str], None]) -> None:
+    """Write a cache file via a temporary file, so concurrent readers never see a partial file."""
+    try:
+        dest_dir = os.path.dirname(dest_path)
+        os.makedirs(dest_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dest_dir)
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, dest_path)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+    except OSError:
+        pass  # The cache is an optimization; ignore write failures
@@ -5,10 +5,26 @@ Uses pymupdf4llm to extract all content from PDF including text, hierarchies, im
 
 import pymupdf4llm
 import fitz  # PyMuPDF
-from typing import Dict, List, Any, Optional
-import json
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+# Quality for images re-encoded as JPEG (see _encode_image)
+_JPEG_QUALITY = 85
+
+# Documents with at most this many pages are extracted in-process; a
+# process pool takes longer to start than the pages take to extract
+_SERIAL_MAX_PAGES = 4
+
+# Document opened once per extraction worker process, and a background
+# thread that writes that worker's image files (see _worker_init)
+_worker_doc = None
+_worker_writer = None
+
 
 def extract_pdf_content(pdf_path: str, max_pages: Optional[int] = None) -> Dict[str, Any]:
     """
@@ -19,63 +35,53 @@ def extract_pdf_content(pdf_path: str, max_pages: Optional[int] = None) -> Dict[
         max_pages: Maximum number of pages to process (optional)
         
     Returns:
-        Dictionary containing extracted content structure
+        Dictionary containing extracted content structure. "text_blocks" is
+        columnar: "text" and "font" are lists, "size" and "page" are arrays
+        with one entry per span, and "bbox" is a flat array holding four
+        coordinates (x0, y0, x1, y1) per span.
     """
     try:
         # Create temp_images directory
         os.makedirs("temp_images", exist_ok=True)
         
-        # Extract markdown without images (we'll extract images separately)
-        md_text = pymupdf4llm.to_markdown(
-            pdf_path,
-            page_chunks=True,
-            write_images=False  # We'll extract images separately with our own filtering
-        )
-        
-        # Extract images separately for processing
         doc = pymupdf4llm.pymupdf.Document(pdf_path)
-        images = []
         
         # Limit pages if max_pages is specified
         total_pages = len(doc)
         if max_pages is not None:
             total_pages = min(total_pages, max_pages)
         
-        for page_num in range(total_pages):
-            page = doc[page_num]
-            image_list = page.get_images()
-            
-            for img_index, img in enumerate(image_list):
-                xref = img[0]
-                pix = fitz.Pixmap(doc, xref)
-                
-                # Filter out small images and header/footer images
-                if should_extract_image(pix, page_num, img_index):
-                    img_path = f"temp_images/page_{page_num}_img_{img_index}.png"
-                    pix.save(img_path)
-                    images.append({
-                        "path": img_path,
-                        "page": page_num,
-                        "index": img_index
-                    })
+        # Extract markdown without images (we'll extract images separately),
+        # reusing the open document and skipping pages beyond max_pages
+        md_text = pymupdf4llm.to_markdown(
+            doc,
+            pages=list(range(total_pages)),
+            page_chunks=True,
+            write_images=False  # We'll extract images separately with our own filtering
+        )
         
-        # Extract text blocks with positioning
-        text_blocks = []
-        for page_num in range(total_pages):
-            page = doc[page_num]
-            blocks = page.get_text("dict")
+        # Extract images and text blocks page by page
+        if total_pages <= _SERIAL_MAX_PAGES:
+            # Short document: reuse the open document in this process
+            with ThreadPoolExecutor(max_workers=1) as writer:
+                page_results = [_extract_doc_page(doc, writer, page_num) for page_num in range(total_pages)]
+            doc.close()
+        else:
+            # The work is CPU-bound and MuPDF serializes within one document,
+            # so use one document per worker process
+            doc.close()
+            max_workers = max(1, min(total_pages, os.cpu_count() or 1))
+            chunksize = max(1, total_pages // (4 * max_workers))
             
-            for block in blocks["blocks"]:
-                if "lines" in block:
-                    for line in block["lines"]:
-                        for span in line["spans"]:
-                            text_blocks.append({
-                                "text": span["text"],
-                                "bbox": span["bbox"],
-                                "font": span["font"],
-                                "size": span["size"],
-                                "page": page_num
-                            })
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_worker_init, initargs=(pdf_path,)) as executor:
+                page_results = list(executor.map(_extract_page, range(total_pages), chunksize=chunksize))
+        
+        images = []
+        text_blocks = _new_text_blocks()
+        for page_result in page_results:
+            images.extend(page_result["images"])
+            for column, values in page_result["text_blocks"].items():
+                text_blocks[column].extend(values)
         
         return {
             "markdown": md_text,
@@ -88,25 +94,147 @@ def extract_pdf_content(pdf_path: str, max_pages: Optional[int] = None) -> Dict[
         raise Exception(f"Error extracting PDF content: {str(e)}")
 
 
-def should_extract_image(pix, page_num: int, img_index: int) -> bool:
+def _worker_init(pdf_path: str) -> None:
+    """Open the PDF once in each extraction worker process."""
+    global _worker_doc, _worker_writer
+    _worker_doc = pymupdf4llm.pymupdf.Document(pdf_path)
+    _worker_writer = ThreadPoolExecutor(max_workers=1)
+
+
+def _extract_page(page_num: int) -> Dict[str, Any]:
+    """Extract the images and text blocks of one page in a worker process."""
+    return _extract_doc_page(_worker_doc, _worker_writer, page_num)
+
+
+def _extract_doc_page(doc, writer: ThreadPoolExecutor, page_num: int) -> Dict[str, Any]:
+    """Extract the images and text blocks of one page, writing images via writer."""
+    # Load the page once for both passes
+    page = doc[page_num]
+    pending_writes = []
+    images = _extract_page_images(doc, page, page_num, writer, pending_writes)
+    text_blocks = _extract_page_text_blocks(page, page_num)
+    
+    # The images must be on disk before the page is reported back
+    for write in pending_writes:
+        write.result()
+    
+    return {
+        "images": images,
+        "text_blocks": text_blocks
+    }
+
+
+def _extract_page_images(doc, page, page_num: int, writer: ThreadPoolExecutor, pending_writes: List[Future]) -> List[Dict[str, Any]]:
+    """
+    Save the page's images that pass the filter to temp_images/.
+    
+    The images are encoded here and written by the writer thread, so disk
+    writes overlap with encoding and text extraction; their futures are
+    added to pending_writes.
+    """
+    images = []
+    image_list = page.get_images()
+    
+    for img_index, img in enumerate(image_list):
+        # (xref, smask, width, height, bpc, colorspace, alt. colorspace, name,
+        # filter, ...): filter on the stored size before decoding the image stream
+        xref, smask, width, height = img[:4]
+        
+        # Filter out small images and header/footer images
+        if not should_extract_image(width, height, page_num, img_index):
+            continue
+        
+        try:
+            pix = fitz.Pixmap(doc, xref)
+            data, ext = _encode_image(pix, img[8], smask)
+        except (RuntimeError, ValueError) as e:
+            # A broken or unsupported image should not abort the page
+            logger.warning("Skipping image %d on page %d: %s", img_index, page_num, e)
+            continue
+        
+        img_path = f"temp_images/page_{page_num}_img_{img_index}.{ext}"
+        pending_writes.append(writer.submit(_write_file, img_path, data))
+        images.append({
+            "path": img_path,
+            "page": page_num,
+            "index": img_index
+        })
+    
+    return images
+
+
+def _encode_image(pix, stream_filter: str, smask: int) -> Tuple[bytes, str]:
+    """
+    Encode a pixmap, returning the data and its file extension.
+    
+    Images stored as JPEG in the PDF (DCTDecode) are photos: they are
+    re-encoded as JPEG, which is much faster to encode and smaller than PNG.
+    Everything else (diagrams, screenshots, masked or non-RGB/gray images)
+    stays lossless PNG.
+    """
+    if stream_filter == "DCTDecode" and not smask and not pix.alpha and pix.n in (1, 3):
+        return pix.tobytes("jpg", jpg_quality=_JPEG_QUALITY), "jpg"
+    return pix.tobytes("png"), "png"
+
+
+def _write_file(path: str, data: bytes) -> None:
+    """Write data to path."""
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _new_text_blocks() -> Dict[str, Any]:
+    """Return an empty columnar text block table (see extract_pdf_content)."""
+    return {
+        "text": [],
+        "bbox": array("d"),
+        "font": [],
+        "size": array("d"),
+        "page": array("i")
+    }
+
+
+def _extract_page_text_blocks(page, page_num: int) -> Dict[str, Any]:
+    """Extract the page's text spans with positioning, one column per field."""
+    text_blocks = _new_text_blocks()
+    texts = text_blocks["text"]
+    bboxes = text_blocks["bbox"]
+    fonts = text_blocks["font"]
+    sizes = text_blocks["size"]
+    blocks = page.get_text("dict")
+    
+    for block in blocks["blocks"]:
+        if "lines" in block:
+            for line in block["lines"]:
+                for span in line["spans"]:
+                    texts.append(span["text"])
+                    bboxes.extend(span["bbox"])
+                    fonts.append(span["font"])
+                    sizes.append(span["size"])
+    
+    text_blocks["page"] = array("i", [page_num]) * len(texts)
+    return text_blocks
+
+
+def should_extract_image(width: int, height: int, page_num: int, img_index: int) -> bool:
     """
     Determine if an image should be extracted based on size and position.
     Filters out header/footer images and text artifacts.
     """
     # Skip very small images (likely text artifacts)
-    if pix.width < 100 or pix.height < 100:
+    if width < 100 or height < 100:
         return False
     
     # Skip very large images that are likely full-page backgrounds
-    if pix.width > 2000 or pix.height > 2000:
+    if width > 2000 or height > 2000:
         return False
     
     # Skip images that are likely headers/footers (very wide and short)
-    if pix.width > pix.height * 3:
+    if width > height * 3:
         return False
     
     # Skip images that are likely text rendered as images (very tall and narrow)
-    if pix.height > pix.width * 3:
+    if height > width * 3:
         return False
     
     return True
@@ -7,6 +7,32 @@ import os
 import shutil
 from typing import Dict, Any
 
+# NTNU Beamer template preamble, up to and including the title page
+_PREAMBLE = r"""
+\documentclass[aspectratio=169]{beamer}
+\usepackage[english]{babel}
+\usepackage{booktabs,listings}
+\usepackage[T1]{fontenc}
+\usepackage[utf8]{inputenc}
+\usepackage{graphicx}
+\usepackage{caption}
+
+% NTNU Theme (basic version without opensans dependency)
+\usetheme[slogan=english,mathfont=serif]{NTNU_basic}
+
+% Title information (will be updated based on content)
+\title[Generated Presentation]{Generated Presentation}
+\subtitle{Converted from PDF}
+\author{PDF to LaTeX Converter}
+\date{\today}
+
+\begin{document}
+\maketitle
+
+"""
+
+_CLOSING = "\n\\end{document}"
+
 
 def generate_latex_document(latex_body: str, extracted_data: Dict[str, Any], output_dir: str) -> str:
     """
@@ -29,46 +55,21 @@ def generate_latex_document(latex_body: str, extracted_data: Dict[str, Any], out
     # Copy NTNU theme files to output directory
     copy_ntnu_theme_files(output_dir)
     
-    # Generate complete LaTeX document
-    latex_content = create_complete_latex_document(latex_body)
-    
-    # Save LaTeX file
+    # Save the complete LaTeX document (as create_complete_latex_document
+    # builds it), writing the pieces directly instead of joining them first
     tex_file_path = os.path.join(output_dir, "presentation.tex")
     with open(tex_file_path, 'w', encoding='utf-8') as f:
-        f.write(latex_content)
+        f.write(_PREAMBLE)
+        f.write(latex_body)
+        f.write(_CLOSING)
     
     return tex_file_path
 
 
 def create_complete_latex_document(latex_body: str) -> str:
     """Create complete LaTeX document with NTNU theme."""
-    
-    # NTNU Beamer template preamble
-    preamble = r"""
-\documentclass[aspectratio=169]{beamer}
-\usepackage[english]{babel}
-\usepackage{booktabs,listings}
-\usepackage[T1]{fontenc}
-\usepackage[utf8]{inputenc}
-\usepackage{graphicx}
-\usepackage{caption}
-
-% NTNU Theme (basic version without opensans dependency)
-\usetheme[slogan=english,mathfont=serif]{NTNU_basic}
-
-% Title information (will be updated based on content)
-\title[Generated Presentation]{Generated Presentation}
-\subtitle{Converted from PDF}
-\author{PDF to LaTeX Converter}
-\date{\today}
-
-\begin{document}
-"""
-    
     # Combine preamble with body and closing
-    complete_document = preamble + "\\maketitle\n\n" + latex_body + "\n\\end{document}"
-    
-    return complete_document
+    return _PREAMBLE + latex_body + _CLOSING
 
 
 def copy_images_to_output(extracted_data: Dict[str, Any], output_dir: str) -> None:
@@ -79,24 +80,31 @@ def copy_images_to_output(extracted_data: Dict[str, Any], output_dir: str) -> No
     # Copy custom extracted images
     for img_data in extracted_data.get("images", []):
         if os.path.exists(img_data["path"]):
-            # Create new filename
-            new_filename = f"page_{img_data['page']}_img_{img_data['index']}.png"
-            new_path = os.path.join(images_dir, new_filename)
+            # Keep the extracted filename (page_X_img_Y.png or .jpg)
+            new_path = os.path.join(images_dir, os.path.basename(img_data["path"]))
             
             # Copy image
-            shutil.copy2(img_data["path"], new_path)
+            _fast_copy(img_data["path"], new_path)
             
             # Update the path in the data for reference
             img_data["output_path"] = new_path
+
+
+def _fast_copy(source_path: str, dest_path: str) -> None:
+    """
+    Hardlink source_path to dest_path, or copy its contents if that fails.
     
-    # Also copy pymupdf4llm images (for fallback LaTeX)
-    temp_images_dir = "temp_images"
-    if os.path.exists(temp_images_dir):
-        for filename in os.listdir(temp_images_dir):
-            if filename.endswith('.png'):
-                source_path = os.path.join(temp_images_dir, filename)
-                dest_path = os.path.join(images_dir, filename)
-                shutil.copy2(source_path, dest_path)
+    The outputs are build artifacts, so metadata is not copied. An existing
+    dest_path is removed first so that writes never go through a link into
+    a source file.
+    """
+    if os.path.lexists(dest_path):
+        os.remove(dest_path)
+    try:
+        os.link(source_path, dest_path)
+    except OSError:
+        # E.g. a different filesystem or links not supported
+        shutil.copyfile(source_path, dest_path)
 
 
 def copy_ntnu_theme_files(output_dir: str) -> None:
@@ -114,7 +122,7 @@ def copy_ntnu_theme_files(output_dir: str) -> None:
         source_path = os.path.join(source_theme_dir, theme_file)
         if os.path.exists(source_path):
             dest_path = os.path.join(output_dir, theme_file)
-            shutil.copy2(source_path, dest_path)
+            _fast_copy(source_path, dest_path)
     
     # Copy logo images
     logo_files = [
@@ -127,5 +135,5 @@ def copy_ntnu_theme_files(output_dir: str) -> None:
         source_path = os.path.join(source_theme_dir, logo_file)
         if os.path.exists(source_path):
             dest_path = os.path.join(output_dir, logo_file)
-            shutil.copy2(source_path, dest_path)
+            _fast_copy(source_path, dest_path)
 
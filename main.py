@@ -10,13 +10,11 @@ import tempfile
 import shutil
 from typing import Optional
 
-from extractor import extract_pdf_content, cleanup_temp_files
-from converter import convert_content_to_latex
 from generator import generate_latex_document
 from compiler import compile_latex_to_pdf, check_latex_installation, cleanup_auxiliary_files
 
 
-def convert_pdf_to_latex(pdf_path: str, api_key: str, output_dir: Optional[str] = None, max_pages: Optional[int] = None) -> Optional[str]:
+def convert_pdf_to_latex(pdf_path: str, api_key: str, output_dir: Optional[str] = None, max_pages: Optional[int] = None, cache_enabled: bool = True) -> Optional[str]:
     """
     Convert PDF to LaTeX Beamer presentation.
     
@@ -25,10 +23,16 @@ def convert_pdf_to_latex(pdf_path: str, api_key: str, output_dir: Optional[str]
         api_key: Google AI Studio API key
         output_dir: Output directory (optional, uses temp if not provided)
         max_pages: Maximum number of pages to process (optional)
+        cache_enabled: Reuse Gemini responses and compiled PDFs cached by earlier runs
         
     Returns:
         Path to generated PDF file, or None if conversion failed
     """
+    # Imported here so that the CLI (e.g. --help) starts without loading
+    # PyMuPDF and the Gemini client
+    from extractor import extract_pdf_content, cleanup_temp_files
+    from converter import convert_content_to_latex
+    
     # Validate input
     if not os.path.exists(pdf_path):
         print(f"Error: PDF file not found: {pdf_path}")
@@ -52,13 +56,13 @@ def convert_pdf_to_latex(pdf_path: str, api_key: str, output_dir: Optional[str]
         extracted_data = extract_pdf_content(pdf_path, max_pages)
         
         print("Step 2: Converting content to LaTeX...")
-        latex_body = convert_content_to_latex(extracted_data, api_key)
+        latex_body = convert_content_to_latex(extracted_data, api_key, cache_enabled)
         
         print("Step 3: Generating LaTeX document...")
         tex_file_path = generate_latex_document(latex_body, extracted_data, output_dir)
         
         print("Step 4: Compiling LaTeX to PDF...")
-        pdf_path = compile_latex_to_pdf(tex_file_path, output_dir)
+        pdf_path = compile_latex_to_pdf(tex_file_path, output_dir, cache_enabled)
         
         if pdf_path:
             print(f"Success! Generated PDF: {pdf_path}")
@@ -90,11 +94,12 @@ def main():
     parser.add_argument("--api-key", required=True, help="Google AI Studio API key")
     parser.add_argument("--output-dir", help="Output directory (optional)")
     parser.add_argument("--output-pdf", help="Output PDF filename (optional)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse Gemini responses or compiled PDFs cached by earlier runs")
     
     args = parser.parse_args()
     
     # Convert PDF
-    result_pdf = convert_pdf_to_latex(args.pdf_path, args.api_key, args.output_dir)
+    result_pdf = convert_pdf_to_latex(args.pdf_path, args.api_key, args.output_dir, cache_enabled=not args.no_cache)
     
     if result_pdf and args.output_pdf:
         # Copy to specified output filename
@@ -0,0 +1,65 @@
+"""
+Tests for parsing Stage 2 image analysis responses.
+"""
+
+import unittest
+
+from converter.workflow.stage2_image_analysis import is_valid_image_analysis_response, parse_image_analysis_response
+
+
+class ParseImageAnalysisResponseTest(unittest.TestCase):
+    """LaTeX inside the JSON strings must survive the backslash repair."""
+
+    def parse_latex_content(self, response: str) -> str:
+        plan = parse_image_analysis_response(response, [])
+        return plan["image_decisions"]["page_1_img_0.png"]["latex_content"]
+
+    def test_unescaped_latex_commands(self):
+        # Raw LaTeX as the LLM writes it: \a is invalid, and \f, \b and \u
+        # would otherwise be taken as JSON escapes
+        response = r'''{
+  "image_decisions": {
+    "page_1_img_0.png": {
+      "action": "CONVERT_TO_LATEX",
+      "latex_content": "$\alpha = \frac{1}{2}$ \begin{tabular}{cc} \underline{A} & B \end{tabular}"
+    }
+  }
+}'''
+        self.assertEqual(
+            self.parse_latex_content(response),
+            r"$\alpha = \frac{1}{2}$ \begin{tabular}{cc} \underline{A} & B \end{tabular}"
+        )
+
+    def test_multiline_unescaped_table(self):
+        # Raw newlines inside the string reach the repair path
+        response = '{"image_decisions": {"page_1_img_0.png": {"latex_content": "\\begin{tabular}{cc}\n\\toprule\nA & B\n\\bottomrule\n\\end{tabular}"}}}'
+        self.assertEqual(
+            self.parse_latex_content(response),
+            "\\begin{tabular}{cc}\n\\toprule\nA & B\n\\bottomrule\n\\end{tabular}"
+        )
+
+    def test_valid_json_is_unchanged(self):
+        # Correctly escaped LaTeX with \n newlines before letters
+        response = '{"image_decisions": {"page_1_img_0.png": {"latex_content": "\\\\begin{tabular}{cc}\\nA & B\\n\\\\end{tabular}"}}}'
+        self.assertEqual(
+            self.parse_latex_content(response),
+            "\\begin{tabular}{cc}\nA & B\n\\end{tabular}"
+        )
+
+
+
+class IsValidImageAnalysisResponseTest(unittest.TestCase):
+    """Only responses that parse into a plan may be cached."""
+
+    def test_repairable_json_is_valid(self):
+        self.assertTrue(is_valid_image_analysis_response(r'{"image_decisions": {"a.png": {"latex_content": "$\alpha$"}}}'))
+
+    def test_response_without_json_is_invalid(self):
+        self.assertFalse(is_valid_image_analysis_response("Sorry, I cannot analyze these images."))
+
+    def test_unparseable_json_is_invalid(self):
+        self.assertFalse(is_valid_image_analysis_response('{"image_decisions": {"a.png": }'))
+
+
+if __name__ == "__main__":
+    unittest.main()
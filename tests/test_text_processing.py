@@ -0,0 +1,73 @@
+"""
+Tests for escaping text around LaTeX math mode.
+"""
+
+import random
+import re
+import unittest
+
+from converter.utils.text_processing import _escape_latex_characters_smart, convert_text_to_latex
+
+_REFERENCE_ESCAPES = str.maketrans({
+    '&': '\\&',
+    '%': '\\%',
+    '$': '\\$',
+    '#': '\\#',
+    '^': '\\textasciicircum{}',
+    '_': '\\_',
+    '{': '\\{',
+    '}': '\\}',
+    '~': '\\textasciitilde{}',
+})
+
+
+def _reference_escape(text: str) -> str:
+    """The original regex split: $...$ parts are math, the rest is escaped."""
+    parts = re.split(r'(\$[^$]*\$)', text)
+    return ''.join(part if i % 2 else part.translate(_REFERENCE_ESCAPES) for i, part in enumerate(parts))
+
+
+def _random_text(rng: random.Random) -> str:
+    """Random text with inline math and LaTeX specials, but no $$ or backslashes."""
+    text = ''.join(rng.choice('ab $&%_#{}~^') for _ in range(rng.randint(0, 20)))
+    return re.sub(r'\$+', '$', text)
+
+
+class EscapeLatexCharactersSmartTest(unittest.TestCase):
+    """Text outside math mode is escaped, math is kept verbatim."""
+
+    def test_matches_reference_split(self):
+        rng = random.Random(0)
+        for _ in range(2000):
+            text = _random_text(rng)
+            self.assertEqual(_escape_latex_characters_smart(text), _reference_escape(text), text)
+
+    def test_unmatched_display_math_is_text(self):
+        # Math after an unmatched $$ must still be recognised
+        rng = random.Random(1)
+        for _ in range(2000):
+            # No $ in before, so the $$ cannot close math opened there
+            before = _random_text(rng).replace('$', '')
+            after = _random_text(rng).lstrip('$')
+            text = before + '$$' + after
+            self.assertEqual(
+                _escape_latex_characters_smart(text),
+                before.translate(_REFERENCE_ESCAPES) + '\\$\\$' + _reference_escape(after),
+                text
+            )
+
+    def test_unmatched_display_math_before_inline_math(self):
+        self.assertEqual(
+            convert_text_to_latex('Save $$ now, if $x_1$ holds'),
+            'Save \\$\\$ now, if $x_1$ holds'
+        )
+
+    def test_display_math_is_kept(self):
+        self.assertEqual(
+            convert_text_to_latex('a $$x_1$$ & $y^2$'),
+            'a $$x_1$$ \\& $y^2$'
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()